@@ -4,9 +4,12 @@
 通过RSS服务获取微博数据，生成美观的长图
 """
 
+import os
 import argparse
 from create import RSSWeiboParser, WeiboImageGenerator
 from push import push_image_file
+import wecom_token
+import wecom_media
 
 
 # 配置
@@ -32,6 +35,7 @@ def main():
     parser.add_argument("--index", type=int, default=0, help="选择第几条微博 (从0开始)")
     parser.add_argument("--list", action="store_true", help="列出所有微博")
     parser.add_argument("--output", help="输出文件名")
+    parser.add_argument("--page-max-height", type=int, default=0, help="单页最大高度（像素），超出时分页，0为不分页")
     
     # 企业微信推送参数
     parser.add_argument("--push", action="store_true", help="推送到企业微信")
@@ -41,6 +45,7 @@ def main():
     parser.add_argument("--touser", default="@all", help="接收者ID，多个用|分隔，默认@all")
     parser.add_argument("--toparty", default="", help="部门ID，多个用|分隔")
     parser.add_argument("--totag", default="", help="标签ID，多个用|分隔")
+    parser.add_argument("--data-dir", default="data", help="访问令牌和已上传图片的 media_id 的保存目录，多次运行之间复用")
     
     args = parser.parse_args()
     
@@ -90,10 +95,10 @@ def main():
     
     # 生成长图
     print("\n🎨 开始生成长图...")
-    generator = WeiboImageGenerator()
-    output_file = generator.generate_screenshot(channel_info, selected_weibo, args.output)
+    generator = WeiboImageGenerator(page_max_height=args.page_max_height)
+    output_files = generator.generate_pages(channel_info, selected_weibo, args.output)
     
-    print(f"\n🎉 完成！长图已保存到: {output_file}")
+    print(f"\n🎉 完成！长图已保存到: {', '.join(output_files)}")
     
     # 检查必需的企业微信参数
     corpid = args.corpid or WECOM_CONFIG.get('corpid')
@@ -115,8 +120,13 @@ def main():
             else:
                 print("\n📤 推送到企业微信...")
             
-            # 推送图片
-            success = push_image_file(
+            # 与监听服务一样把访问令牌和 media_id 保存到数据目录，每次运行不必重新获取令牌
+            os.makedirs(args.data_dir, exist_ok=True)
+            wecom_token.configure(args.data_dir)
+            wecom_media.configure(args.data_dir)
+            
+            # 推送图片（分页的长图按页序逐张推送）
+            success = all([push_image_file(
                 output_file,
                 corpid=corpid,
                 corpsecret=corpsecret,
@@ -124,7 +134,7 @@ def main():
                 touser=args.touser or WECOM_CONFIG.get('touser', '@all'),
                 toparty=args.toparty,
                 totag=args.totag
-            )
+            ) for output_file in output_files])
             
             if not success:
                 print("💡 提示：推送失败，请检查企业微信配置是否正确")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能基准测试工具
+对比优化前后的实现的耗时；旧实现和样本生成函数在 tests/ 下（输出一致性由那里的测试校验），需在仓库目录中运行
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+from io import BytesIO
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests'))
+
+from legacy import (
+    legacy_clean_html, legacy_extract_media, legacy_wrap_text, legacy_crop_to_square,
+    legacy_poster, legacy_play_icon, legacy_circle_avatar,
+)
+from samples import sample_text, sample_description, sample_photo, sample_post
+from create import RSSWeiboParser, WeiboImageGenerator, RESOLUTION_PROFILES
+from geometry import square_crop_plan, poster_plan, apply_plan
+
+
+def best_time(func, arg, number, repeat=5):
+    """多次运行取最快一轮，返回单次调用耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(arg)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def bench_clean_html(args):
+    """clean_html：单遍扫描 vs 多次正则替换"""
+    print("⏱️ clean_html 耗时对比:")
+    for paragraphs in (10, 40, 200):
+        html = sample_description(paragraphs)
+        old = best_time(legacy_clean_html, html, args.number)
+        new = best_time(RSSWeiboParser.clean_html, html, args.number)
+        print(f"  {len(html):>6} 字符: 旧 {old * 1e6:8.1f}μs | 新 {new * 1e6:8.1f}μs | 提速 {old / new:.1f}x")
+    return 0
+
+
+def bench_extract_media(args):
+    """extract_media：单次扫描 vs 逐张图片回扫全文"""
+    print("⏱️ 图片/视频提取耗时对比:")
+    for paragraphs, images in ((10, 1), (40, 9), (200, 9)):
+        html = sample_description(paragraphs, images=images)
+        old = best_time(legacy_extract_media, html, args.number)
+        new = best_time(RSSWeiboParser.extract_media, html, args.number)
+        print(f"  {len(html):>6} 字符 / {images} 张图: 旧 {old * 1e6:8.1f}μs | 新 {new * 1e6:8.1f}μs | 提速 {old / new:.1f}x")
+    return 0
+
+
+def bench_wrap_text(args):
+    """wrap_text：字宽累加估算 vs 逐字符 textbbox 测量"""
+    generator = WeiboImageGenerator()
+    font = generator.content_font
+    max_width = 2400 - 64 * 2 - 80 * 2
+
+    print("⏱️ wrap_text 耗时对比:")
+    for chars in (200, 1000, 3000):
+        text = sample_text(chars)
+        old = best_time(lambda t: legacy_wrap_text(generator, t, font, max_width), text, args.number)
+        new = best_time(lambda t: generator.wrap_text(t, font, max_width), text, args.number)
+        print(f"  {len(text):>6} 字符: 旧 {old * 1e3:8.2f}ms | 新 {new * 1e3:8.2f}ms | 提速 {old / new:.1f}x")
+    return 0
+
+
+def bench_decode(args):
+    """decode_image：JPEG 缩小解码 vs 全尺寸解码后缩放"""
+    generator = WeiboImageGenerator()
+
+    def legacy_decode(job):
+        content, size = job
+        return generator.crop_to_square(Image.open(BytesIO(content)).convert("RGB"), size)
+
+    def draft_decode(job):
+        content, size = job
+        return generator.decode_image(content, square_size=size)
+
+    print("⏱️ 配图解码耗时对比:")
+    for source in ((4000, 3000), (2000, 1500), (1080, 1920)):
+        content = sample_photo(source)
+        for side in (213, 427, 640, 1920):
+            job = (content, (side, side))
+            old = best_time(legacy_decode, job, args.number)
+            new = best_time(draft_decode, job, args.number)
+            print(f"  {source[0]}x{source[1]} -> {side}x{side}: 旧 {old * 1e3:7.1f}ms | 新 {new * 1e3:7.1f}ms | "
+                  f"提速 {old / new:.1f}x")
+    return 0
+
+
+def bench_geometry(args):
+    """几何规划：一次 resize(box=...) vs 多次重采样"""
+    print("⏱️ 重采样耗时对比:")
+    cases = [
+        ('小图放大为网格', (400, 300), lambda img: legacy_crop_to_square(img, (640, 640)),
+         lambda img: apply_plan(img, square_crop_plan(img.size, 640))),
+        ('大图裁剪为单图', (2000, 1500), lambda img: legacy_crop_to_square(img, (1920, 1920)),
+         lambda img: apply_plan(img, square_crop_plan(img.size, 1920))),
+        ('竖版视频封面放大', (720, 1280), lambda img: legacy_poster(img, 2112),
+         lambda img: apply_plan(img, poster_plan(img.size, 2112))),
+    ]
+    for label, size, old_func, new_func in cases:
+        img = Image.open(BytesIO(sample_photo(size))).convert('RGB')
+        old = best_time(old_func, img, args.number)
+        new = best_time(new_func, img, args.number)
+        print(f"  {label} {size[0]}x{size[1]}: 旧 {old * 1e3:7.1f}ms | 新 {new * 1e3:7.1f}ms | 提速 {old / new:.1f}x")
+    return 0
+
+
+def bench_overlay(args):
+    """播放图标和圆形头像：局部合成 + 预渲染图标 vs 整帧合成"""
+    generator = WeiboImageGenerator()
+
+    print("⏱️ 合成耗时对比:")
+    for size in ((1920, 1080), (1080, 1920), (1920, 1920)):
+        img = Image.open(BytesIO(sample_photo(size))).convert('RGB')
+        old = best_time(legacy_play_icon, img, args.number)
+        new = best_time(generator.add_video_play_icon, img, args.number)
+        print(f"  播放图标 {size[0]}x{size[1]}: 旧 {old * 1e3:7.1f}ms | 新 {new * 1e3:7.1f}ms | 提速 {old / new:.1f}x")
+    avatar = Image.open(BytesIO(sample_photo((192, 192)))).convert('RGB')
+    old = best_time(lambda img: legacy_circle_avatar(img, (192, 192)), avatar, args.number * 10)
+    new = best_time(lambda img: generator.create_circle_avatar(img, (192, 192)), avatar, args.number * 10)
+    print(f"  圆形头像 192x192: 旧 {old * 1e3:7.2f}ms | 新 {new * 1e3:7.2f}ms | 提速 {old / new:.1f}x")
+    return 0
+
+
+def bench_render_profiles(args):
+    """generate_pages：各分辨率档位的渲染耗时和输出大小"""
+    photo = sample_photo()
+    generator = WeiboImageGenerator()
+    # 图片直接返回本地样张，只统计渲染和编码
+    generator.fetch_image_bytes = lambda url, headers: photo
+    output_dir = tempfile.mkdtemp(prefix='weibo-bench-')
+
+    print(f"⏱️ 渲染耗时对比（{args.chars} 字 + {args.images} 张配图）:")
+    results = {}
+    for profile in RESOLUTION_PROFILES:
+        channel_info, weibo_item = sample_post(args.chars, args.images)
+        generator.fonts_for(profile)
+        best = float('inf')
+        for _ in range(args.number):
+            # 每轮清空头像缓存，包含头像处理耗时
+            generator._avatar_tiles.clear()
+            start = time.perf_counter()
+            paths = generator.generate_pages(channel_info, weibo_item,
+                                             filename=os.path.join(output_dir, f'bench_{profile}.jpg'),
+                                             profile=profile)
+            best = min(best, time.perf_counter() - start)
+        size = sum(os.path.getsize(path) for path in paths)
+        with Image.open(paths[0]) as first_page:
+            dimensions = first_page.size
+        results[profile] = (best, size)
+        print(f"  {profile}: {dimensions[0]}x{dimensions[1]}px x {len(paths)} 页 | "
+              f"{best * 1e3:8.1f}ms | {size / 1024:8.0f}KB")
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    base_time, base_size = results['3x']
+    for profile, (elapsed, size) in results.items():
+        if profile != '3x':
+            print(f"  {profile} 相比 3x: 耗时 {elapsed / base_time:.0%}，体积 {size / base_size:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="性能基准测试工具")
+    subparsers = parser.add_subparsers(dest='command', help='可用命令')
+
+    clean_parser = subparsers.add_parser('clean-html', help='clean_html 耗时对比')
+    clean_parser.add_argument('--number', type=int, default=200, help='每轮调用次数')
+    clean_parser.set_defaults(func=bench_clean_html)
+
+    media_parser = subparsers.add_parser('extract-media', help='图片/视频提取耗时对比')
+    media_parser.add_argument('--number', type=int, default=200, help='每轮调用次数')
+    media_parser.set_defaults(func=bench_extract_media)
+
+    wrap_parser = subparsers.add_parser('wrap-text', help='正文换行耗时对比')
+    wrap_parser.add_argument('--number', type=int, default=3, help='每轮调用次数')
+    wrap_parser.set_defaults(func=bench_wrap_text)
+
+    decode_parser = subparsers.add_parser('decode', help='配图解码耗时对比')
+    decode_parser.add_argument('--number', type=int, default=3, help='每轮调用次数')
+    decode_parser.set_defaults(func=bench_decode)
+
+    geometry_parser = subparsers.add_parser('geometry', help='几何规划重采样耗时对比')
+    geometry_parser.add_argument('--number', type=int, default=3, help='每轮调用次数')
+    geometry_parser.set_defaults(func=bench_geometry)
+
+    overlay_parser = subparsers.add_parser('overlay', help='播放图标/圆形头像合成耗时对比')
+    overlay_parser.add_argument('--number', type=int, default=5, help='每轮调用次数')
+    overlay_parser.set_defaults(func=bench_overlay)
+
+    profile_parser = subparsers.add_parser('render-profiles', help='各分辨率档位的渲染耗时和输出大小')
+    profile_parser.add_argument('--number', type=int, default=3, help='每个档位渲染次数（取最快一次）')
+    profile_parser.add_argument('--chars', type=int, default=600, help='正文字数')
+    profile_parser.add_argument('--images', type=int, default=9, help='配图数量')
+    profile_parser.set_defaults(func=bench_render_profiles)
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -6,6 +6,7 @@
 import os
 import json
 import time
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
@@ -17,6 +18,9 @@ CLEANUP_LOG_FILE = DATA_DIR / "cleanup.json"
 SEEN_ITEMS_FILE = DATA_DIR / "seen_items.json"
 CLEANUP_AFTER_DAYS = 1  # 推送成功后几天删除图片
 
+# cleanup.json 的读-改-写锁：推送线程并发标记图片、定期清理同时进行时不丢记录
+_data_lock = threading.Lock()
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -42,11 +46,13 @@ class ImageCleanupManager:
             return {"pushed_images": {}, "last_cleanup": None}
     
     def save_cleanup_data(self):
-        """保存清理数据"""
+        """保存清理数据（先写临时文件再替换，写入中途失败不会清空原文件）"""
         try:
             DATA_DIR.mkdir(exist_ok=True)
-            with open(CLEANUP_LOG_FILE, 'w', encoding='utf-8') as f:
+            tmp_path = f"{CLEANUP_LOG_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(self.cleanup_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, CLEANUP_LOG_FILE)
         except Exception as e:
             logger.error(f"保存清理数据失败: {e}")
     
@@ -56,12 +62,14 @@ class ImageCleanupManager:
             abs_path = str(Path(image_path).resolve())
             push_time = datetime.now().isoformat()
             
-            self.cleanup_data["pushed_images"][abs_path] = {
-                "push_time": push_time,
-                "file_size": os.path.getsize(image_path) if os.path.exists(image_path) else 0
-            }
-            
-            self.save_cleanup_data()
+            with _data_lock:
+                # 重新读取，保留其他线程在此期间写入的记录
+                self.cleanup_data = self.load_cleanup_data()
+                self.cleanup_data["pushed_images"][abs_path] = {
+                    "push_time": push_time,
+                    "file_size": os.path.getsize(image_path) if os.path.exists(image_path) else 0
+                }
+                self.save_cleanup_data()
             logger.info(f"✅ 标记图片已推送: {image_path}")
             
         except Exception as e:
@@ -70,54 +78,57 @@ class ImageCleanupManager:
     def cleanup_old_images(self):
         """清理旧图片"""
         try:
-            current_time = datetime.now()
-            deleted_count = 0
-            total_size_freed = 0
-            
-            # 获取需要清理的图片列表
-            images_to_delete = []
-            
-            for image_path, info in self.cleanup_data["pushed_images"].items():
-                try:
-                    push_time = datetime.fromisoformat(info["push_time"])
-                    age_days = (current_time - push_time).days
+            with _data_lock:
+                self.cleanup_data = self.load_cleanup_data()
+                
+                current_time = datetime.now()
+                deleted_count = 0
+                total_size_freed = 0
+                
+                # 获取需要清理的图片列表
+                images_to_delete = []
+                
+                for image_path, info in self.cleanup_data["pushed_images"].items():
+                    try:
+                        push_time = datetime.fromisoformat(info["push_time"])
+                        age_days = (current_time - push_time).days
+                        
+                        if age_days >= CLEANUP_AFTER_DAYS:
+                            images_to_delete.append((image_path, info))
                     
-                    if age_days >= CLEANUP_AFTER_DAYS:
+                    except Exception as e:
+                        logger.warning(f"解析推送时间失败 {image_path}: {e}")
+                        # 如果解析失败，也加入删除列表（可能是格式错误的数据）
                         images_to_delete.append((image_path, info))
+                
+                # 执行删除
+                for image_path, info in images_to_delete:
+                    try:
+                        if os.path.exists(image_path):
+                            file_size = os.path.getsize(image_path)
+                            os.remove(image_path)
+                            total_size_freed += file_size
+                            deleted_count += 1
+                            logger.info(f"🗑️ 删除旧图片: {image_path}")
                         
-                except Exception as e:
-                    logger.warning(f"解析推送时间失败 {image_path}: {e}")
-                    # 如果解析失败，也加入删除列表（可能是格式错误的数据）
-                    images_to_delete.append((image_path, info))
-            
-            # 执行删除
-            for image_path, info in images_to_delete:
-                try:
-                    if os.path.exists(image_path):
-                        file_size = os.path.getsize(image_path)
-                        os.remove(image_path)
-                        total_size_freed += file_size
-                        deleted_count += 1
-                        logger.info(f"🗑️ 删除旧图片: {image_path}")
+                        # 从记录中移除
+                        del self.cleanup_data["pushed_images"][image_path]
                     
-                    # 从记录中移除
-                    del self.cleanup_data["pushed_images"][image_path]
-                    
-                except Exception as e:
-                    logger.error(f"删除图片失败 {image_path}: {e}")
-            
-            # 更新最后清理时间
-            self.cleanup_data["last_cleanup"] = current_time.isoformat()
-            self.save_cleanup_data()
-            
-            # 输出清理统计
-            if deleted_count > 0:
-                size_mb = total_size_freed / (1024 * 1024)
-                logger.info(f"🧹 清理完成: 删除了 {deleted_count} 个文件，释放了 {size_mb:.2f}MB 空间")
-            else:
-                logger.info("✅ 清理完成: 没有需要删除的文件")
-            
-            return deleted_count, total_size_freed
+                    except Exception as e:
+                        logger.error(f"删除图片失败 {image_path}: {e}")
+                
+                # 更新最后清理时间
+                self.cleanup_data["last_cleanup"] = current_time.isoformat()
+                self.save_cleanup_data()
+                
+                # 输出清理统计
+                if deleted_count > 0:
+                    size_mb = total_size_freed / (1024 * 1024)
+                    logger.info(f"🧹 清理完成: 删除了 {deleted_count} 个文件，释放了 {size_mb:.2f}MB 空间")
+                else:
+                    logger.info("✅ 清理完成: 没有需要删除的文件")
+                
+                return deleted_count, total_size_freed
             
         except Exception as e:
             logger.error(f"清理过程失败: {e}")
@@ -134,7 +145,7 @@ class ImageCleanupManager:
             total_size_freed = 0
             
             # 获取所有图片文件
-            image_files = list(OUTPUTS_DIR.glob("*.jpg")) + list(OUTPUTS_DIR.glob("*.png"))
+            image_files = [f for pattern in ("*.jpg", "*.png", "*.webp") for f in OUTPUTS_DIR.glob(pattern)]
             
             for image_file in image_files:
                 try:
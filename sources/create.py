@@ -7,38 +7,106 @@
 import requests
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 import xml.etree.ElementTree as ET
 import re
 import math
 import os
+import hashlib
+import threading
 from datetime import datetime, timedelta
+from collections import deque
 from html import unescape
 from font_manager import ensure_fonts
+from media_cache import normalize_url
+from glyph_table import GlyphAdvanceTable
+from encoder import ImageEncoder
+from geometry import square_crop_plan, fit_plan, poster_plan, apply_plan
+import sprites
+import http_client
 
 
 # 配置
 FONT_PATH = ensure_fonts()  # 使用字体管理器获取字体路径
+
+# 分辨率档位：相对于超高清基准版面（3x，宽2400px）的缩放比例
+RESOLUTION_PROFILES = {
+    '1x': 1 / 3,
+    '2x': 2 / 3,
+    '3x': 1.0,
+}
+DEFAULT_PROFILE = '3x'
+
+# 新浪图床的尺寸规格及其最大宽度（像素），从小到大排列；large 为原图
+SINAIMG_VARIANTS = (
+    ('orj360', 360),
+    ('bmiddle', 440),
+    ('orj480', 480),
+    ('mw690', 690),
+    ('mw1024', 1024),
+    ('mw2000', 2000),
+    ('large', None),
+)
+_SINAIMG_PATH = re.compile(
+    r'^(https?://[^/]+\.sinaimg\.cn/)(?:(?:thumbnail|bmiddle|small|square|large|orj\d+|mw\d+|thumb\d+)/)?([^/]+)$'
+)
+VARIANT_SKIP_FAILURES = 2  # 某主机上某规格累计404达到此次数（且多于成功次数）后不再尝试
+ASPECT_HISTORY = 20  # 每个主机记录最近多少张配图的宽高比，用来预估正方形裁剪需要的规格宽度
+ASPECT_MIN_SAMPLES = 3  # 记录达到此数量后才按宽高比预估
 OUTPUT_DIR = "outputs"
 
+# clean_html 使用的预编译正则：<br>（捕获）| 整个<video>元素 | 其他任意标签
+_HTML_TOKEN = re.compile(r'(?i:(<br\s*/?>))|(?s:(<video.*?</video>))|<[^>]+>')
+_EXTRA_BLANK_LINES = re.compile(r'\n\s*\n\s*\n+')
+# 正文中有不成对的“<”时 clean_html 按旧的顺序分步替换：<br>、<video>、<img>、<a>、其余标签
+_STEPWISE_TAGS = (
+    (re.compile(r'<br\s*/?>', re.IGNORECASE), '\n'),
+    (re.compile(r'<video.*?</video>', re.DOTALL), ''),
+    (re.compile(r'<img[^>]*>'), ''),
+    (re.compile(r'<a[^>]*>(.*?)</a>'), r'\1'),
+    (re.compile(r'<[^>]+>'), ''),
+)
+
+# extract_media 使用的预编译正则：媒体标签及其属性
+_MEDIA_TAG = re.compile(r'<(img|video|source)\b([^>]*)>', re.IGNORECASE)
+_TAG_ATTR = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+
 
 class RSSWeiboParser:
     """RSS微博数据解析器"""
     
+    # RSS内容未变化（HTTP 304）时 fetch_rss_data 的返回值
+    NOT_MODIFIED = object()
+    
     @staticmethod
-    def fetch_rss_data(rss_url):
-        """获取RSS数据"""
+    def fetch_rss_data(rss_url, validator_store=None):
+        """获取RSS数据
+        
+        传入 validator_store 时发送条件请求，内容未变化返回 RSSWeiboParser.NOT_MODIFIED
+        """
         try:
             print(f"🔍 获取RSS数据: {rss_url}")
-            response = requests.get(rss_url, timeout=15)
+            headers = validator_store.request_headers(rss_url) if validator_store else {}
+            response = http_client.get(rss_url, kind='rss', headers=headers)
+            if response.status_code == 304:
+                print(f"💤 RSS内容未变化: {rss_url}")
+                return RSSWeiboParser.NOT_MODIFIED
             response.raise_for_status()
+            if validator_store:
+                validator_store.stage(rss_url, response.headers)
             return response.text
         except Exception as e:
             print(f"❌ 获取RSS数据失败: {e}")
             return None
     
     @staticmethod
-    def parse_rss_xml(xml_content):
-        """解析RSS XML"""
+    def parse_rss_xml(xml_content, item_filter=None):
+        """解析RSS XML
+        
+        item_filter 接收 parse_item_identity 的结果，返回False的条目跳过正文、图片和视频提取
+        """
         try:
             root = ET.fromstring(xml_content)
             channel = root.find('channel')
@@ -61,6 +129,8 @@ class RSSWeiboParser:
             # 解析微博条目
             items = []
             for item in channel.findall('item'):
+                if item_filter and not item_filter(RSSWeiboParser.parse_item_identity(item)):
+                    continue
                 weibo_item = RSSWeiboParser.parse_weibo_item(item)
                 if weibo_item:
                     items.append(weibo_item)
@@ -71,6 +141,15 @@ class RSSWeiboParser:
             print(f"❌ 解析RSS XML失败: {e}")
             return None, []
     
+    @staticmethod
+    def parse_item_identity(item):
+        """只读取用于去重的标识字段（link/guid/pubDate），不做内容解析"""
+        return {
+            'link': item.findtext('link') or '',
+            'guid': item.findtext('guid') or '',
+            'pub_date': item.findtext('pubDate') or ''
+        }
+    
     @staticmethod
     def parse_weibo_item(item):
         """解析单条微博"""
@@ -80,6 +159,7 @@ class RSSWeiboParser:
             link = item.find('link').text if item.find('link') is not None else ''
             pub_date = item.find('pubDate').text if item.find('pubDate') is not None else ''
             author = item.find('author').text if item.find('author') is not None else ''
+            guid = item.find('guid').text if item.find('guid') is not None else ''
             
             # 提取微博ID
             weibo_id = ''
@@ -92,17 +172,15 @@ class RSSWeiboParser:
             clean_title = RSSWeiboParser.clean_text(title)
             clean_description = RSSWeiboParser.clean_html(description)
             
-            # 提取图片URLs
-            image_urls = RSSWeiboParser.extract_image_urls(description)
-            
-            # 提取视频信息
-            video_info = RSSWeiboParser.extract_video_info(description)
+            # 一次扫描同时提取图片URLs和视频信息
+            image_urls, video_info = RSSWeiboParser.extract_media(description)
             
             return {
                 'id': weibo_id,
                 'title': clean_title,
                 'content': clean_description,
                 'link': link,
+                'guid': guid or '',
                 'pub_date': pub_date,
                 'author': author,
                 'image_urls': image_urls,
@@ -128,165 +206,371 @@ class RSSWeiboParser:
     
     @staticmethod
     def clean_html(html_content):
-        """清理HTML内容，提取纯文本并保留正确的换行"""
+        """清理HTML内容，提取纯文本并保留正确的换行
+        
+        单遍扫描：<br> 转为换行，<video>...</video> 整段移除，其余标签（图片、链接、段落等）只保留文本；
+        正文中有不成对的“<”时按 <br>、<video>、其余标签的顺序分步替换，与逐条正则替换的结果一致
+        """
         if not html_content:
             return ''
         
-        # 先替换<br>为换行（在删除其他标签之前）
-        html_content = re.sub(r'<br\s*/?>', '\n', html_content, flags=re.IGNORECASE)
-        html_content = re.sub(r'<br>', '\n', html_content, flags=re.IGNORECASE)
-        
-        # 移除视频标签
-        html_content = re.sub(r'<video.*?</video>', '', html_content, flags=re.DOTALL)
-        
-        # 移除图片标签
-        html_content = re.sub(r'<img[^>]*>', '', html_content)
-        
-        # 移除其他HTML标签，但保留链接文本
-        html_content = re.sub(r'<a[^>]*>(.*?)</a>', r'\1', html_content)
-        html_content = re.sub(r'<[^>]+>', '', html_content)
-        
-        # 处理段落标签为双换行
-        html_content = re.sub(r'</p>\s*<p[^>]*>', '\n\n', html_content, flags=re.IGNORECASE)
-        html_content = re.sub(r'</?p[^>]*>', '\n', html_content, flags=re.IGNORECASE)
-        
-        # 处理div标签为换行
-        html_content = re.sub(r'</div>\s*<div[^>]*>', '\n', html_content, flags=re.IGNORECASE)
-        html_content = re.sub(r'</?div[^>]*>', '\n', html_content, flags=re.IGNORECASE)
+        # split 后每个标签占两位：(<br>或None, <video>元素或None)，其余标签两位均为None
+        parts = _HTML_TOKEN.split(html_content)
+        videos = [video for video in parts[2::3] if video]
+        tag_count = len(parts) // 3 - len(videos)
+        if html_content.count('<') == tag_count + sum(video.count('<') for video in videos):
+            parts[1::3] = ['\n' if tag else '' for tag in parts[1::3]]
+            parts[2::3] = [''] * (len(parts) // 3)
+            text = ''.join(parts)
+        else:
+            # 有不成对的“<”（如“a<<br>b”），标签边界有歧义，按旧的顺序分步替换
+            text = html_content
+            for pattern, replacement in _STEPWISE_TAGS:
+                text = pattern.sub(replacement, text)
         
         # 解码HTML实体
-        html_content = unescape(html_content)
-        
-        # 清理多余空行（保留单个换行）
-        html_content = re.sub(r'\n\s*\n\s*\n+', '\n\n', html_content)
-        html_content = re.sub(r'^\s+|\s+$', '', html_content)  # 去除首尾空白
+        text = unescape(text)
         
-        return html_content
+        # 清理多余空行（保留单个换行），去除首尾空白
+        return _EXTRA_BLANK_LINES.sub('\n\n', text).strip()
     
     @staticmethod
-    def extract_image_urls(html_content):
-        """从HTML中提取图片URLs"""
+    def iter_media_tags(html_content):
+        """逐个产出 <img>/<video>/<source> 标签：(标签名, 属性字典, 标签原文)"""
+        for match in _MEDIA_TAG.finditer(html_content):
+            attrs = {}
+            for attr in _TAG_ATTR.finditer(match.group(2)):
+                name = attr.group(1).lower()
+                if name not in attrs:
+                    attrs[name] = next(value for value in attr.group(2, 3, 4) if value is not None)
+            yield match.group(1).lower(), attrs, match.group(0)
+    
+    @staticmethod
+    def extract_media(html_content):
+        """单次扫描提取图片URLs和视频信息，返回 (image_urls, video_info)"""
         if not html_content:
-            return []
+            return [], None
         
-        # 查找所有img标签的src属性
-        image_pattern = r'<img[^>]*src="([^"]*)"[^>]*>'
-        matches = re.findall(image_pattern, html_content)
-        
-        # 过滤出有效的图片URL
-        valid_urls = []
-        for url in matches:
-            # 跳过小图标和系统图标
-            skip_keywords = ['icon', 'emoji', 'timeline_card', 'small_video_default', '1rem', 'avatar']
-            should_skip = any(keyword in url.lower() for keyword in skip_keywords)
-            
-            # 检查img标签的style属性是否包含小尺寸
-            img_match = re.search(rf'<img[^>]*src="{re.escape(url)}"[^>]*>', html_content)
-            if img_match:
-                img_tag = img_match.group(0)
-                if 'width: 1rem' in img_tag or 'height: 1rem' in img_tag:
-                    should_skip = True
-            
-            if not should_skip and url.startswith('http'):
-                valid_urls.append(url)
+        # 跳过小图标和系统图标
+        skip_keywords = ['icon', 'emoji', 'timeline_card', 'small_video_default', '1rem', 'avatar']
         
-        return valid_urls
+        image_urls = []
+        video_info = {}
+        for tag_name, attrs, tag in RSSWeiboParser.iter_media_tags(html_content):
+            if tag_name == 'img':
+                url = attrs.get('src', '')
+                should_skip = any(keyword in url.lower() for keyword in skip_keywords)
+                
+                # 检查img标签的style属性是否包含小尺寸
+                if 'width: 1rem' in tag or 'height: 1rem' in tag:
+                    should_skip = True
+                
+                if not should_skip and url.startswith('http'):
+                    image_urls.append(url)
+            elif tag_name == 'video':
+                # 视频封面
+                if attrs.get('poster') and 'poster' not in video_info:
+                    video_info['poster'] = attrs['poster']
+            elif tag_name == 'source':
+                # 视频链接
+                if attrs.get('src') and 'video_url' not in video_info:
+                    video_info['video_url'] = attrs['src']
+        
+        return image_urls, video_info if video_info else None
+    
+    @staticmethod
+    def extract_image_urls(html_content):
+        """从HTML中提取图片URLs"""
+        return RSSWeiboParser.extract_media(html_content)[0]
     
     @staticmethod
     def extract_video_info(html_content):
         """提取视频信息"""
-        if not html_content:
-            return None
-        
-        video_info = {}
-        
-        # 提取视频封面
-        poster_match = re.search(r'poster="([^"]*)"', html_content)
-        if poster_match:
-            video_info['poster'] = poster_match.group(1)
-        
-        # 提取视频链接
-        video_match = re.search(r'<source src="([^"]*)"[^>]*>', html_content)
-        if video_match:
-            video_info['video_url'] = video_match.group(1)
-        
-        return video_info if video_info else None
+        return RSSWeiboParser.extract_media(html_content)[1]
 
 
 class WeiboImageGenerator:
     """微博长图生成器"""
     
-    def __init__(self):
+    def __init__(self, media_workers=6, media_budget=45, media_cache=None, avatar_cache_dir=None, encoder=None,
+                 page_max_height=0, profile=DEFAULT_PROFILE):
+        if profile not in RESOLUTION_PROFILES:
+            raise ValueError(f"未知的分辨率档位: {profile}，可选: {', '.join(RESOLUTION_PROFILES)}")
+        self.profile = profile  # 默认分辨率档位
+        self.media_workers = max(1, media_workers)  # 单条微博并发下载媒体的线程数
+        self.media_budget = media_budget  # 单条微博媒体下载总时限（秒）
+        self.media_cache = media_cache  # 图片下载缓存（MediaCache），为None时不缓存
+        self.encoder = encoder or ImageEncoder()  # 长图输出编码器
+        self.last_encode_stats = None  # 最近一次长图编码的格式、质量、大小和耗时
+        self.page_max_height = page_max_height  # 单页最大高度（像素），超出时分页，0为不分页
+        
+        # 圆形头像缓存：频道 -> (规范化头像URL, 尺寸, 头像图块)，可选落盘
+        self.avatar_cache_dir = avatar_cache_dir
+        self._avatar_tiles = {}
+        self._avatar_lock = threading.Lock()
+        if avatar_cache_dir:
+            os.makedirs(avatar_cache_dir, exist_ok=True)
+        
+        # 字体 -> 字符宽度表，供 wrap_text 用累加和计算行宽
+        self._glyph_tables = {}
+        # 分辨率档位 -> (用户名字体, 时间字体, 正文字体)
+        self._profile_fonts = {}
+        
+        # (主机, 图片规格) -> [404次数, 成功次数]，用于跳过该主机上不存在的规格
+        self._variant_stats = {}
+        # 主机 -> 最近配图的宽高比 max(1, 宽/高)，横图居多时直接从足够宽的规格开始，省去一次下载
+        self._aspect_history = {}
+        self._variant_lock = threading.Lock()
+        
         self.setup_fonts()
         os.makedirs(OUTPUT_DIR, exist_ok=True)
     
     def setup_fonts(self):
-        """设置字体（超高清版）"""
+        """设置字体（默认分辨率档位）"""
+        self.name_font, self.time_font, self.content_font = self.fonts_for(self.profile)
+    
+    def fonts_for(self, profile):
+        """获取分辨率档位对应的 (用户名, 时间, 正文) 字体，每个档位只加载一次"""
+        fonts = self._profile_fonts.get(profile)
+        if fonts is not None:
+            return fonts
+        
+        scale = RESOLUTION_PROFILES[profile]
         try:
             if FONT_PATH:
-                self.name_font = ImageFont.truetype(FONT_PATH, 70)  # 用户名字体更大
-                self.time_font = ImageFont.truetype(FONT_PATH, 50)  # 时间字体更大
-                self.content_font = ImageFont.truetype(FONT_PATH, 64)  # 正文字体更大
-                print("✅ 超高清字体加载成功")
+                fonts = (
+                    ImageFont.truetype(FONT_PATH, round(70 * scale)),  # 用户名字体更大
+                    ImageFont.truetype(FONT_PATH, round(50 * scale)),  # 时间字体更大
+                    ImageFont.truetype(FONT_PATH, round(64 * scale)),  # 正文字体更大
+                )
+                print(f"✅ 超高清字体加载成功（{profile}）")
             else:
                 raise Exception("字体路径为空")
         except Exception as e:
             print(f"⚠️ 字体加载失败，使用默认字体: {e}")
-            self.name_font = ImageFont.load_default()
-            self.time_font = ImageFont.load_default()
-            self.content_font = ImageFont.load_default()
+            default_font = ImageFont.load_default()
+            fonts = (default_font, default_font, default_font)
+        
+        for font in fonts:
+            self.glyph_table(font)
+        self._profile_fonts[profile] = fonts
+        return fonts
+    
+    def fetch_images(self, jobs):
+        """并发下载多张图片的内容（不解码），结果按 jobs 顺序返回
+        
+        jobs 为 [(url, download_image的关键字参数), ...]；下载失败或超出单条微博下载时限的图片为None，
+        由 decode_fetched 解码或生成占位图
+        """
+        if not jobs:
+            return []
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.media_workers, len(jobs)),
+                                      thread_name_prefix='media-download')
+        try:
+            futures = [executor.submit(self.fetch_image, url, **kwargs) for url, kwargs in jobs]
+            wait(futures, timeout=self.media_budget)
+            
+            results = []
+            for future, (url, kwargs) in zip(futures, jobs):
+                if future.done() and future.exception() is None:
+                    results.append(future.result())
+                else:
+                    print(f"⏰ 图片下载超时，使用占位图片: {url[:80]}")
+                    results.append(None)
+            return results
+        finally:
+            # 不等待超时的下载线程，未开始的任务直接取消
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self.media_cache:
+                self.media_cache.flush()
+    
+    def fetch_image_bytes(self, url, headers):
+        """获取图片内容，优先使用本地缓存，缓存过期时发送条件请求"""
+        content, fresh = self.media_cache.get(url) if self.media_cache else (None, False)
+        if fresh:
+            return content
+        
+        request_headers = dict(headers)
+        if content is not None:
+            request_headers.update(self.media_cache.revalidation_headers(url))
+        
+        response = http_client.get(url, kind='image', headers=request_headers)
+        if response.status_code == 304 and content is not None:
+            self.media_cache.refresh(url, response.headers)
+            return content
+        response.raise_for_status()
+        
+        if self.media_cache:
+            self.media_cache.put(url, response.content, response.headers)
+        return response.content
+    
+    def variant_candidates(self, url, target_side):
+        """按目标边长选择新浪图床的图片规格，返回 [(规格, URL)]
+        
+        从宽度能满足目标边长的最小规格开始，依次列出更大的规格，原图（large）作为兜底；
+        规格只限制宽度，横图裁剪所需的宽度要拿到图片尺寸后才知道：fetch_image 按该主机常见的宽高比预估，
+        预估不足时再跳过不够大的规格。
+        已知在该主机上404的规格直接跳过。非新浪图床或头像裁剪地址返回None
+        """
+        match = _SINAIMG_PATH.match(url)
+        if not match or '/crop.' in url:
+            return None
+        prefix, filename = match.groups()
+        host = urlsplit(normalize_url(url)).netloc
+        
+        candidates = []
+        with self._variant_lock:
+            for name, side in SINAIMG_VARIANTS:
+                if side is None:
+                    candidates.append((name, f"{prefix}{name}/{filename}"))
+                    break
+                failures, successes = self._variant_stats.get((host, name), (0, 0))
+                if side < target_side or (failures >= VARIANT_SKIP_FAILURES and failures > successes):
+                    continue
+                candidates.append((name, f"{prefix}{name}/{filename}"))
+        return candidates
     
-    def download_image(self, url, square_size=None, force_size=None):
-        """下载图片，智能获取最佳分辨率版本"""
+    def _record_variant(self, url, variant, found):
+        """记录某主机上图片规格是否存在"""
+        host = urlsplit(normalize_url(url)).netloc
+        with self._variant_lock:
+            stats = self._variant_stats.setdefault((host, variant), [0, 0])
+            stats[1 if found else 0] += 1
+    
+    def expected_aspect(self, url):
+        """该主机上最近配图宽高比 max(1, 宽/高) 的中位数，记录不足时返回1"""
+        host = urlsplit(normalize_url(url)).netloc
+        with self._variant_lock:
+            history = sorted(self._aspect_history.get(host, ()))
+        if len(history) < ASPECT_MIN_SAMPLES:
+            return 1
+        return history[len(history) // 2]
+    
+    def _record_aspect(self, url, size):
+        """记录配图的宽高比"""
+        host = urlsplit(normalize_url(url)).netloc
+        with self._variant_lock:
+            history = self._aspect_history.setdefault(host, deque(maxlen=ASPECT_HISTORY))
+            history.append(max(1, size[0] / size[1]))
+    
+    @staticmethod
+    def required_width(size, square_size=None, force_size=None, target_side=None):
+        """源图尺寸为 size 时，不放大就能得到最终尺寸所需的源图宽度"""
+        width, height = size
+        if force_size:
+            return max(force_size[0], math.ceil(force_size[1] * width / height))
+        if square_size:
+            # 正方形裁剪需要短边达到目标边长，横图的宽度要按比例更大
+            return math.ceil(square_size[0] * max(1, width / height))
+        return target_side or 0
+    
+    def download_image(self, url, square_size=None, force_size=None, target_side=None):
+        """下载并解码图片，失败时返回占位图片"""
+        kwargs = {'square_size': square_size, 'force_size': force_size, 'target_side': target_side}
+        return self.decode_fetched(self.fetch_image(url, **kwargs), kwargs)
+    
+    def decode_fetched(self, content, kwargs):
+        """解码 fetch_image 下载的图片内容并处理为最终尺寸；内容为None或无法解码时返回占位图片"""
+        if content is not None:
+            try:
+                return self.decode_image(content, **kwargs)
+            except Exception as e:
+                print(f"⚠️ 图片处理失败: {str(e)[:100]}...")
+        return self.create_placeholder_image(kwargs.get('force_size') or kwargs.get('square_size') or (640, 640))
+    
+    def decode_video_poster(self, content, kwargs):
+        """解码视频封面并添加播放图标"""
+        return self.add_video_play_icon(self.decode_fetched(content, kwargs))
+    
+    def fetch_image(self, url, square_size=None, force_size=None, target_side=None):
+        """下载图片内容（不解码），按目标尺寸选择合适的分辨率版本；所有URL都失败时返回None
+        
+        target_side 为图片最终需要的边长，未指定时按 square_size 推断；
+        新浪图床图片据此选择规格，不再总是下载原图
+        """
         if not url:
-            return self.create_placeholder_image(force_size or square_size or (640, 640))
+            return None
             
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Referer': 'https://weibo.com/'
         }
         
-        # 尝试多个URL策略
+        # 尝试多个URL策略：(描述, URL, 新浪图床规格)
         urls_to_try = []
         
-        # 1. 高分辨率URL
-        high_res_url = self.get_high_resolution_url(url)
-        if high_res_url != url:
-            urls_to_try.append(('高分辨率', high_res_url))
-        
-        # 2. 原始URL  
-        urls_to_try.append(('原始', url))
-        
-        # 3. 如果是crop URL，尝试直接去掉crop参数
-        if '/crop.' in url:
-            try:
-                # 简单去掉crop参数的方法
-                base_url = url.split('/crop.')[0]
-                filename = url.split('/')[-1]
-                simple_url = f"{base_url}/{filename}"
-                urls_to_try.append(('去crop', simple_url))
-            except:
-                pass
+        target_side = target_side or (square_size[0] if square_size else None)
+        target_width = target_side
+        if square_size and target_side:
+            # 正方形裁剪时按该主机配图常见的宽高比预估需要的宽度，横图不必先下载一个宽度不够的规格
+            target_width = math.ceil(target_side * self.expected_aspect(url))
+        variants = self.variant_candidates(url, target_width) if target_side else None
+        if variants:
+            # 1. 从满足目标宽度的最小规格开始逐级增大，原图兜底
+            for name, variant_url in variants:
+                urls_to_try.append((f'{name}规格', variant_url, name))
+            
+            # 2. 原始URL
+            if url not in [test_url for _, test_url, _ in urls_to_try]:
+                urls_to_try.append(('原始', url, None))
+        else:
+            # 1. 高分辨率URL
+            high_res_url = self.get_high_resolution_url(url)
+            if high_res_url != url:
+                urls_to_try.append(('高分辨率', high_res_url, None))
+            
+            # 2. 原始URL  
+            urls_to_try.append(('原始', url, None))
+            
+            # 3. 如果是crop URL，尝试直接去掉crop参数
+            if '/crop.' in url:
+                try:
+                    # 简单去掉crop参数的方法
+                    base_url = url.split('/crop.')[0]
+                    filename = url.split('/')[-1]
+                    simple_url = f"{base_url}/{filename}"
+                    urls_to_try.append(('去crop', simple_url, None))
+                except:
+                    pass
         
         # 依次尝试不同的URL
-        for desc, test_url in urls_to_try:
+        variant_caps = dict(SINAIMG_VARIANTS)
+        min_width = 0  # 规格宽度不够时，后续规格至少需要的宽度
+        fallback = None  # 宽度不够的规格图片 (内容, 宽度)，更大的规格都获取失败时使用
+        for desc, test_url, variant in urls_to_try:
+            cap = variant_caps.get(variant)
+            if cap and cap < min_width:
+                continue
             try:
-                response = requests.get(test_url, headers=headers, timeout=15)
-                response.raise_for_status()
-                
-                img = Image.open(BytesIO(response.content)).convert("RGB")
-                print(f"📷 {desc}图片获取成功: {img.size[0]}x{img.size[1]}px")
+                content = self.fetch_image_bytes(test_url, headers)
+                if variant:
+                    self._record_variant(test_url, variant, True)
                 
-                # 处理图片尺寸
-                if force_size:
-                    img = img.resize(force_size, Image.Resampling.LANCZOS)
-                elif square_size:
-                    img = self.crop_to_square(img, square_size)
+                # 只读取文件头得到尺寸，同时排除不是图片的响应
+                size = Image.open(BytesIO(content)).size
+                if variant and square_size:
+                    self._record_aspect(test_url, size)
+                if cap:
+                    # 规格只限制宽度：宽度被压到上限且不够裁剪时，换更大的规格，避免放大
+                    needed = self.required_width(size, square_size, force_size, target_side)
+                    if cap <= size[0] < needed:
+                        print(f"📐 {desc}图片 {size[0]}x{size[1]}px 分辨率不足（需要宽度 {needed}px），尝试更大规格")
+                        min_width = needed
+                        fallback = (content, size[0])
+                        continue
+                elif fallback and size[0] < fallback[1]:
+                    # 原始URL本身是更小的缩略图
+                    print(f"⚠️ {desc}图片比已获取的规格更小，使用已获取的规格")
+                    content = fallback[0]
                 
-                return img
+                print(f"📷 {desc}图片获取成功")
+                return content
                 
             except requests.exceptions.RequestException as e:
                 if "404" in str(e):
+                    if variant:
+                        self._record_variant(test_url, variant, False)
                     print(f"⚠️ {desc}图片不存在 (404): {test_url[:80]}...")
                 else:
                     print(f"⚠️ {desc}图片下载失败: {str(e)[:100]}...")
@@ -295,9 +579,50 @@ class WeiboImageGenerator:
                 print(f"⚠️ {desc}图片处理失败: {str(e)[:100]}...")
                 continue
         
-        # 所有URL都失败，创建占位图片
-        print(f"❌ 所有图片URL都无法访问，使用占位图片")
-        return self.create_placeholder_image(force_size or square_size or (640, 640))
+        if fallback:
+            print("⚠️ 更大规格的图片都无法获取，使用分辨率不足的规格")
+            return fallback[0]
+        
+        print("❌ 所有图片URL都无法访问，使用占位图片")
+        return None
+    
+    def decode_image(self, content, square_size=None, force_size=None, target_side=None):
+        """解码图片并处理为最终尺寸
+        
+        解码前根据最终尺寸计算所需的最小分辨率，JPEG 用 draft() 按 1/2、1/4、1/8 缩小解码，
+        之后只做一次重采样
+        """
+        img = Image.open(BytesIO(content))
+        original_size = img.size
+        
+        # 解码后至少需要的尺寸
+        if force_size:
+            needed = force_size
+        elif square_size:
+            scale = square_size[0] / min(original_size)
+            needed = (math.ceil(original_size[0] * scale), math.ceil(original_size[1] * scale))
+        elif target_side:
+            scale = target_side / original_size[0]
+            needed = (math.ceil(original_size[0] * scale), math.ceil(original_size[1] * scale))
+        else:
+            needed = None
+        
+        if needed and img.format == 'JPEG' and needed[0] < original_size[0] and needed[1] < original_size[1]:
+            img.draft('RGB', needed)
+        img = img.convert("RGB")
+        
+        if img.size != original_size:
+            print(f"📐 缩小解码: {original_size[0]}x{original_size[1]}px -> {img.size[0]}x{img.size[1]}px")
+        else:
+            print(f"📐 图片尺寸: {img.size[0]}x{img.size[1]}px")
+        
+        # 处理图片尺寸
+        if force_size:
+            img = img.resize(force_size, Image.Resampling.LANCZOS)
+        elif square_size:
+            img = self.crop_to_square(img, square_size)
+        
+        return img
     
     def create_placeholder_image(self, size):
         """创建占位图片"""
@@ -307,6 +632,7 @@ class WeiboImageGenerator:
             width = height = size
             
         placeholder = Image.new("RGB", (width, height), "#F0F0F0")
+        placeholder.info['placeholder'] = True  # 标记为占位图，避免被缓存
         draw = ImageDraw.Draw(placeholder)
         
         # 绘制一个简单的图标
@@ -397,140 +723,140 @@ class WeiboImageGenerator:
     
     def resize_keep_ratio(self, img, max_size):
         """保持比例调整图片大小"""
-        original_width, original_height = img.size
-        max_width, max_height = max_size
-        
-        # 计算缩放比例
-        width_ratio = max_width / original_width
-        height_ratio = max_height / original_height
-        ratio = min(width_ratio, height_ratio)
-        
-        # 计算新尺寸
-        new_width = int(original_width * ratio)
-        new_height = int(original_height * ratio)
-        
-        return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        return apply_plan(img, fit_plan(img.size, max_size))
     
     def add_video_play_icon(self, img):
-        """在图片上添加视频播放图标"""
+        """在图片上添加视频播放图标（只合成图标所在区域）"""
         width, height = img.size
         
-        # 创建带透明度的播放图标
         icon_size = min(width, height) // 4
         icon_x = (width - icon_size) // 2
         icon_y = (height - icon_size) // 2
-        
-        # 创建一个新的图层用于绘制图标
-        overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-        
-        # 绘制半透明圆形背景
-        circle_radius = icon_size // 2
-        circle_center = (icon_x + circle_radius, icon_y + circle_radius)
-        draw.ellipse([
-            circle_center[0] - circle_radius, circle_center[1] - circle_radius,
-            circle_center[0] + circle_radius, circle_center[1] + circle_radius
-        ], fill=(0, 0, 0, 128))
-        
-        # 绘制三角形播放图标
-        triangle_size = icon_size // 3
-        triangle_x = circle_center[0] - triangle_size // 3
-        triangle_y = circle_center[1]
-        
-        triangle_points = [
-            (triangle_x, triangle_y - triangle_size // 2),
-            (triangle_x, triangle_y + triangle_size // 2),
-            (triangle_x + triangle_size, triangle_y)
-        ]
-        draw.polygon(triangle_points, fill=(255, 255, 255, 255))
-        
-        # 将图标叠加到原图片上
-        result = img.convert('RGBA')
-        result = Image.alpha_composite(result, overlay)
-        return result.convert('RGB')
+        sprite = sprites.play_icon(icon_size)
+        
+        # 裁出图标区域转为RGBA合成，再贴回RGB原图，其余像素不做模式转换
+        result = img.convert('RGB')
+        box = (icon_x, icon_y, icon_x + sprite.size[0], icon_y + sprite.size[1])
+        region = result.crop(box).convert('RGBA')
+        region.alpha_composite(sprite)
+        result.paste(region.convert('RGB'), box[:2])
+        return result
     
     def crop_to_square(self, img, size):
-        """从中心裁剪图片为正方形，优化高分辨率处理"""
-        original_width, original_height = img.size
-        target_size = size[0]  # 目标正方形边长
-        
-        # 如果原图已经很小，先放大再处理
-        min_dimension = min(original_width, original_height)
-        if min_dimension < target_size:
-            # 放大到至少目标尺寸的1.5倍，确保质量
-            scale_factor = (target_size * 1.5) / min_dimension
-            new_width = int(original_width * scale_factor)
-            new_height = int(original_height * scale_factor)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            original_width, original_height = new_width, new_height
-        
-        # 计算裁剪区域，从中心开始
-        if original_width > original_height:
-            # 横向图片，以高度为准
-            scale = target_size / original_height
-            new_width = int(original_width * scale)
-            new_height = target_size
-            
-            # 先缩放
-            img_scaled = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 从中心裁剪为正方形
-            left = (new_width - target_size) // 2
-            top = 0
-            right = left + target_size
-            bottom = target_size
-            
-        else:
-            # 纵向图片或正方形，以宽度为准
-            scale = target_size / original_width
-            new_width = target_size
-            new_height = int(original_height * scale)
-            
-            # 先缩放
-            img_scaled = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 从中心裁剪为正方形
-            left = 0
-            top = (new_height - target_size) // 2
-            right = target_size
-            bottom = top + target_size
-        
-        # 执行裁剪
-        cropped = img_scaled.crop((left, top, right, bottom))
-        return cropped
+        """从中心裁剪图片为正方形（裁剪和缩放合并为一次重采样，小图直接放大到目标尺寸）"""
+        return apply_plan(img, square_crop_plan(img.size, size[0]))
     
     def create_circle_avatar(self, avatar_img, size):
         """创建圆形头像，带微妙阴影"""
-        # 创建圆形蒙版
-        mask = Image.new("L", size, 0)
-        draw = ImageDraw.Draw(mask)
-        draw.ellipse((0, 0, size[0], size[1]), fill=255)
-        
-        # 调整头像尺寸
-        avatar_resized = avatar_img.resize(size, Image.Resampling.LANCZOS)
-        
-        # 创建带阴影的头像
-        shadow_size = (size[0] + 4, size[1] + 4)
-        shadow = Image.new("RGBA", shadow_size, (0, 0, 0, 0))
-        shadow_draw = ImageDraw.Draw(shadow)
-        
-        # 绘制阴影
-        shadow_draw.ellipse([2, 2, size[0] + 2, size[1] + 2], fill=(0, 0, 0, 30))
+        # 调整头像尺寸（下载时已缩放到头像尺寸的不再重采样）
+        avatar_resized = apply_plan(avatar_img, (None, size))
         
-        # 创建头像
-        result = Image.new("RGBA", shadow_size, (0, 0, 0, 0))
+        # 圆形头像（蒙版按尺寸预先绘制）
         avatar_bg = Image.new("RGBA", size, (255, 255, 255, 255))
         avatar_bg.paste(avatar_resized, (0, 0))
-        avatar_bg.putalpha(mask)
+        avatar_bg.putalpha(sprites.circle_mask(size))
         
-        # 合成阴影和头像
-        result = Image.alpha_composite(result, shadow)
+        # 在预先绘制的阴影副本上叠加头像
+        result = sprites.avatar_shadow(size).copy()
         result.paste(avatar_bg, (0, 0), avatar_bg)
         
         return result
     
+    def _avatar_tile_path(self, url_key, size):
+        """头像图块的磁盘缓存路径"""
+        digest = hashlib.sha1(url_key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.avatar_cache_dir, f"{digest}_{size[0]}x{size[1]}.png")
+    
+    def get_cached_avatar(self, channel_info, size):
+        """读取缓存的圆形头像，频道头像地址变化时视为未命中"""
+        channel_key = channel_info.get('link') or channel_info.get('title', '')
+        url_key = normalize_url(channel_info['image_url']) if channel_info.get('image_url') else ''
+        
+        with self._avatar_lock:
+            cached = self._avatar_tiles.get(channel_key)
+        if cached and cached[0] == url_key and cached[1] == size:
+            return cached[2]
+        
+        # 内存未命中时读取磁盘缓存
+        if self.avatar_cache_dir and url_key:
+            tile_path = self._avatar_tile_path(url_key, size)
+            if os.path.exists(tile_path):
+                try:
+                    with Image.open(tile_path) as tile_file:
+                        tile = tile_file.convert('RGBA')
+                    self.store_avatar(channel_info, size, tile)
+                    return tile
+                except Exception as e:
+                    print(f"⚠️ 读取头像缓存失败: {e}")
+        return None
+    
+    def store_avatar(self, channel_info, size, tile):
+        """缓存圆形头像；头像地址变化时替换旧的缓存"""
+        channel_key = channel_info.get('link') or channel_info.get('title', '')
+        url_key = normalize_url(channel_info['image_url']) if channel_info.get('image_url') else ''
+        
+        with self._avatar_lock:
+            previous = self._avatar_tiles.get(channel_key)
+            self._avatar_tiles[channel_key] = (url_key, size, tile)
+        
+        if not (self.avatar_cache_dir and url_key):
+            return
+        try:
+            tile_path = self._avatar_tile_path(url_key, size)
+            if not os.path.exists(tile_path):
+                # 先写临时文件再替换，多个渲染进程同时写入时不会读到半个文件
+                tmp_path = f"{tile_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                tile.save(tmp_path, format='PNG')
+                os.replace(tmp_path, tile_path)
+            # 频道更换头像后删除旧图块
+            if previous and previous[0] and previous[0] != url_key:
+                old_path = self._avatar_tile_path(previous[0], previous[1])
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+        except Exception as e:
+            print(f"⚠️ 保存头像缓存失败: {e}")
+    
+    def build_avatar(self, channel_info, size, avatar_img=None):
+        """生成并缓存圆形头像；未提供 avatar_img 时自动下载"""
+        if avatar_img is None:
+            if channel_info.get('image_url'):
+                avatar_img = self.download_image(channel_info['image_url'], force_size=size)
+            else:
+                # 创建默认头像
+                avatar_img = Image.new("RGB", size, "#4A90E2")
+                draw = ImageDraw.Draw(avatar_img)
+                draw.ellipse([5, 5, size[0]-5, size[1]-5], fill="white")
+        
+        tile = self.create_circle_avatar(avatar_img, size)
+        # 下载失败的占位图不缓存，下次重新下载
+        if not avatar_img.info.get('placeholder'):
+            self.store_avatar(channel_info, size, tile)
+        return tile
+    
+    def prefetch_avatar(self, channel_info, profile=None):
+        """预生成频道头像，已缓存时跳过；返回是否生成了新的头像"""
+        side = round(192 * RESOLUTION_PROFILES[profile or self.profile])
+        size = (side, side)
+        if self.get_cached_avatar(channel_info, size) is not None:
+            return False
+        self.build_avatar(channel_info, size)
+        if self.media_cache:
+            self.media_cache.flush()
+        return True
+    
+    def glyph_table(self, font):
+        """获取字体的字符宽度表（首次使用时加载或生成）"""
+        table = self._glyph_tables.get(font)
+        if table is None:
+            table = self._glyph_tables.setdefault(font, GlyphAdvanceTable(font))
+        return table
+    
     def wrap_text(self, text, font, max_width):
-        """文字换行（优化中文换行）"""
+        """文字换行（优化中文换行）
+        
+        用字符宽度表的累加和估算行宽，只在接近最大宽度时才用 textbbox 精确测量，
+        断行结果与逐字精确测量一致
+        """
         if not text:
             return ''
             
@@ -540,43 +866,64 @@ class WeiboImageGenerator:
         temp_img = Image.new("RGB", (1, 1), "white")
         draw = ImageDraw.Draw(temp_img)
         
+        table = self.glyph_table(font)
+        # 估算宽度与实际宽度的差异（字形侧轴、字距）远小于一个字号
+        tolerance = table.size
+        
         for paragraph in paragraphs:
             if not paragraph.strip():
                 lines.append('')
                 continue
             
-            # 对于很长的段落，优先在标点符号处换行
-            current_line = ''
+            prefix = table.prefix_widths(paragraph)
+            exact = False  # 估算偏差过大时退回逐字精确测量
+            
+            # 当前行为 paragraph[line_start:i]，对于很长的段落，优先在标点符号处换行
+            line_start = 0
             i = 0
             while i < len(paragraph):
-                char = paragraph[i]
-                test_line = current_line + char
-                bbox = draw.textbbox((0, 0), test_line, font=font)
+                if not exact:
+                    # 估算宽度明显不超限的字符直接跳过
+                    i = max(i, table.fit_end(prefix, line_start, max_width - tolerance))
+                    if i >= len(paragraph):
+                        break
                 
-                if bbox[2] - bbox[0] <= max_width:
-                    current_line = test_line
+                test_width = prefix[i + 1] - prefix[line_start]
+                if not exact and test_width > max_width + tolerance:
+                    fits = False
+                else:
+                    bbox = draw.textbbox((0, 0), paragraph[line_start:i + 1], font=font)
+                    measured = bbox[2] - bbox[0]
+                    if not exact and abs(measured - test_width) > tolerance / 2:
+                        # 估算不可靠，本段落从当前行开头重新逐字测量
+                        exact = True
+                        i = line_start
+                        continue
+                    fits = measured <= max_width
+                
+                if fits:
                     i += 1
                 else:
                     # 如果当前行为空，强制添加字符避免无限循环
-                    if not current_line:
-                        current_line = char
+                    if i == line_start:
                         i += 1
                     
                     # 尝试在合适的位置断行
+                    current_line = paragraph[line_start:i]
                     break_pos = self.find_break_position(current_line)
                     if break_pos > 0 and break_pos < len(current_line):
-                        # 在找到的位置断行
+                        # 在找到的位置断行，剩余部分的宽度由累加和直接得到，无需重新测量
                         lines.append(current_line[:break_pos])
-                        current_line = current_line[break_pos:]
+                        line_start += break_pos
                         # 不增加i，重新检查当前字符
                     else:
                         # 没找到合适断点，在当前位置断行
                         lines.append(current_line)
-                        current_line = ''
+                        line_start = i
                         # 不增加i，重新处理当前字符
             
-            if current_line:
-                lines.append(current_line)
+            if line_start < len(paragraph):
+                lines.append(paragraph[line_start:])
         
         return '\n'.join(lines)
     
@@ -627,17 +974,30 @@ class WeiboImageGenerator:
             except:
                 return pub_date
     
-    def generate_screenshot(self, channel_info, weibo_item, filename=None, output_prefix=None):
-        """生成微博截图（高清版）"""
-        # 设置超高清画布参数
-        width = 2400
-        margin = 64
-        padding = 80
-        spacing = 48
-        image_spacing = 80  # 文字和图片之间的间距
-        avatar_size = (192, 192)
-        single_image_size = (1920, 1920)  # 单张图片的正方形尺寸
-        grid_image_size = (640, 640)    # 网格图片的正方形尺寸
+    def generate_pages(self, channel_info, weibo_item, filename=None, output_prefix=None, profile=None):
+        """生成微博长图（高清版），返回各页输出路径的列表
+        
+        设置了 page_max_height 时，超高的长图按文字行和配图行分成多页，逐页绘制、编码并释放；
+        profile 指定分辨率档位（默认使用生成器的档位），整个版面按比例缩放
+        """
+        profile = profile or self.profile
+        scale = RESOLUTION_PROFILES[profile]
+        name_font, time_font, content_font = self.fonts_for(profile)
+        
+        def px(value):
+            """基准版面（3x）中的像素值换算到当前档位"""
+            return round(value * scale)
+        
+        # 设置画布参数（3x档位即超高清基准版面）
+        width = px(2400)
+        margin = px(64)
+        padding = px(80)
+        spacing = px(48)
+        image_spacing = px(80)  # 文字和图片之间的间距
+        avatar_size = (px(192), px(192))
+        single_image_size = (px(1920), px(1920))  # 单张图片的正方形尺寸
+        grid_image_size = (px(640), px(640))    # 网格图片的正方形尺寸
+        text_spacing = px(20)  # 正文行间距
         
         # 生成规范的文件名：weibo_频道uid_帖子id_日期_时间（东八区）
         if not filename:
@@ -651,28 +1011,18 @@ class WeiboImageGenerator:
             beijing_datetime = self.get_beijing_datetime(weibo_item.get('pub_date', ''))
             
             # 生成文件名
-            filename = f"weibo_{channel_uid}_{post_id}_{beijing_datetime}.jpg"
+            filename = f"weibo_{channel_uid}_{post_id}_{beijing_datetime}{self.encoder.extension}"
         
         output_path = os.path.join(OUTPUT_DIR, filename)
         
-        # 下载头像
-        print("📷 下载头像...")
-        if channel_info.get('image_url'):
-            avatar_img = self.download_image(channel_info['image_url'], force_size=avatar_size)
-        else:
-            # 创建默认头像
-            avatar_img = Image.new("RGB", avatar_size, "#4A90E2")
-            draw = ImageDraw.Draw(avatar_img)
-            draw.ellipse([5, 5, avatar_size[0]-5, avatar_size[1]-5], fill="white")
-        
-        avatar = self.create_circle_avatar(avatar_img, avatar_size)
-        
-        # 下载配图和视频封面
-        images = []
-        total_media_count = len(weibo_item.get('image_urls', []))
+        # 统计媒体数量
+        image_urls = weibo_item.get('image_urls', [])
+        video_info = weibo_item.get('video_info') or {}
+        poster_url = video_info.get('poster')
+        total_media_count = len(image_urls)
         
         # 如果有视频，计入总媒体数量
-        if weibo_item.get('video_info') and weibo_item['video_info'].get('poster'):
+        if poster_url:
             total_media_count += 1
         
         # 根据总媒体数量决定尺寸
@@ -680,51 +1030,58 @@ class WeiboImageGenerator:
         target_size = single_image_size if use_single_size else grid_image_size
         
         # 检查是否为纯视频微博（只有视频，没有图片）
-        is_video_only = (len(weibo_item.get('image_urls', [])) == 0 and 
-                        weibo_item.get('video_info') and 
-                        weibo_item['video_info'].get('poster'))
-        
-        # 下载图片
-        if weibo_item.get('image_urls'):
-            print(f"📷 下载 {len(weibo_item['image_urls'])} 张配图...")
-            for i, url in enumerate(weibo_item['image_urls'], 1):
-                print(f"  下载第 {i}/{len(weibo_item['image_urls'])} 张图片...")
-                img = self.download_image(url, square_size=target_size)
-                images.append(img)
-        
-        # 下载视频封面
-        if weibo_item.get('video_info') and weibo_item['video_info'].get('poster'):
-            print("📹 下载高分辨率视频封面...")
+        is_video_only = bool(len(image_urls) == 0 and poster_url)
+        
+        # 头像优先使用缓存
+        avatar = self.get_cached_avatar(channel_info, avatar_size)
+        fetch_avatar = avatar is None and bool(channel_info.get('image_url'))
+        
+        # 并发下载头像、配图和视频封面，结果按原顺序返回
+        download_jobs = []
+        if fetch_avatar:
+            download_jobs.append((channel_info['image_url'], {'force_size': avatar_size}))
+        for url in image_urls:
+            download_jobs.append((url, {'square_size': target_size}))
+        if poster_url:
+            # 纯视频微博保持原始比例，混合媒体裁剪为正方形
+            download_jobs.append((poster_url, {'target_side': width - 2 * (margin + padding)}
+                                  if is_video_only else {'square_size': target_size}))
+        
+        print(f"📷 并发下载 {len(download_jobs)} 个媒体文件...")
+        fetched = [(content, kwargs) for content, (_, kwargs) in zip(self.fetch_images(download_jobs), download_jobs)]
+        
+        # 头像
+        if avatar is None:
+            avatar = self.build_avatar(channel_info, avatar_size, self.decode_fetched(*fetched.pop(0)) if fetch_avatar else None)
+        
+        # 配图（以及混合媒体中的视频封面）尺寸固定，先只保留下载的压缩内容，绘制到所在页时才解码
+        images = [partial(self.decode_fetched, content, kwargs) for content, kwargs in fetched[:len(image_urls)]]
+        
+        # 视频封面
+        if poster_url:
+            content, kwargs = fetched[len(image_urls)]
             if is_video_only:
-                # 纯视频微博：保持原始比例，但限制最大宽度
+                # 纯视频微博：版面高度取决于封面比例，立即解码；保持原始比例，但限制最大宽度；
+                # 分辨率太小时智能放大，一次重采样完成
+                video_poster = self.decode_fetched(content, kwargs)
                 max_video_width = width - 2 * (margin + padding)
-                video_poster = self.download_image(weibo_item['video_info']['poster'], force_size=None)
-                # 如果原图分辨率太小，智能放大
-                if video_poster.size[0] < max_video_width * 0.8:
-                    scale_factor = max_video_width / video_poster.size[0]
-                    new_width = int(video_poster.size[0] * scale_factor)
-                    new_height = int(video_poster.size[1] * scale_factor)
-                    video_poster = video_poster.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                    print(f"📈 视频封面智能放大到: {new_width}x{new_height}px")
-                # 按比例缩放，保持宽高比
-                video_poster = self.resize_keep_ratio(video_poster, (max_video_width, max_video_width))
+                plan = poster_plan(video_poster.size, max_video_width)
+                if plan[1][0] > video_poster.size[0]:
+                    print(f"📈 视频封面智能放大到: {plan[1][0]}x{plan[1][1]}px")
+                video_poster = self.add_video_play_icon(apply_plan(video_poster, plan))
+                poster_height = video_poster.size[1]
+                images.append(lambda poster=video_poster: poster)
             else:
-                # 混合媒体：裁剪为正方形高分辨率
-                video_poster = self.download_image(weibo_item['video_info']['poster'], square_size=target_size)
-            
-            if video_poster:
-                # 添加播放图标
-                video_poster_with_icon = self.add_video_play_icon(video_poster)
-                images.append(video_poster_with_icon)
+                images.append(partial(self.decode_video_poster, content, kwargs))
         
         # 计算文字区域 - 确保左右边距相等
         side_margin = margin + padding  # 左右边距相等
         text_width = width - 2 * side_margin
-        wrapped_content = self.wrap_text(weibo_item['content'], self.content_font, text_width)
+        wrapped_content = self.wrap_text(weibo_item['content'], content_font, text_width)
         
         temp_img = Image.new("RGB", (width, 1000), "white")
         draw = ImageDraw.Draw(temp_img)
-        text_bbox = draw.multiline_textbbox((0, 0), wrapped_content, font=self.content_font, spacing=20)
+        text_bbox = draw.multiline_textbbox((0, 0), wrapped_content, font=content_font, spacing=text_spacing)
         text_height = text_bbox[3] - text_bbox[1]
         
         # 计算配图区域高度
@@ -733,7 +1090,7 @@ class WeiboImageGenerator:
             if len(images) == 1:
                 if is_video_only:
                     # 纯视频微博：使用实际视频封面高度
-                    image_area_height = images[0].size[1] + image_spacing
+                    image_area_height = poster_height + image_spacing
                 else:
                     # 单张图片，固定正方形尺寸
                     image_area_height = single_image_size[1] + image_spacing
@@ -741,89 +1098,140 @@ class WeiboImageGenerator:
                 # 多张图片，网格布局，固定正方形尺寸
                 cols = min(3, len(images))
                 rows = math.ceil(len(images) / cols)
-                gap = 12  # 增加网格间距
+                gap = px(12)  # 增加网格间距
                 image_area_height = rows * grid_image_size[1] + (rows - 1) * gap + image_spacing
         
         # 计算总高度
         header_height = avatar_size[1] + spacing
         content_height = text_height + spacing * 2
-        total_height = margin * 2 + header_height + content_height + image_area_height + 40
-        
-        # 创建画布 - 使用更自然的背景色
-        canvas = Image.new("RGB", (width, total_height), "#FAFAFA")
-        draw = ImageDraw.Draw(canvas)
+        total_height = margin * 2 + header_height + content_height + image_area_height + px(40)
         
-        # 绘制头像（带阴影）
+        # 头像和用户信息位置
         avatar_x = margin + padding
         avatar_y = margin + padding
-        
-        # 粘贴带阴影的头像
-        canvas.paste(avatar, (avatar_x - 2, avatar_y - 2), avatar)
-        
-        # 绘制用户信息
-        name_x = avatar_x + avatar_size[0] + 15
-        name_y = avatar_y + 8
-        
-        # 用户名 - 使用更深的颜色增强对比度
+        name_x = avatar_x + avatar_size[0] + px(15)
+        name_y = avatar_y + px(8)
         author_name = weibo_item.get('author', '未知用户')
-        draw.text((name_x, name_y), author_name, font=self.name_font, fill="#1A1A1A")
         # 动态计算用户名底部
-        name_bbox = draw.textbbox((name_x, name_y), author_name, font=self.name_font)
+        name_bbox = draw.textbbox((name_x, name_y), author_name, font=name_font)
         name_bottom = name_bbox[1] + (name_bbox[3] - name_bbox[1])
         # 发布时间，紧跟在用户名下方，留足间距
-        time_y = name_bottom + 10  # 10像素额外间距
+        time_y = name_bottom + px(10)  # 额外间距
         formatted_time = self.format_time(weibo_item.get('pub_date', ''))
-        draw.text((name_x, time_y), formatted_time, font=self.time_font, fill="#666666")
-        
-        # 绘制正文内容 - 使用更深的颜色增强可读性
-        content_y = margin + padding + header_height + 16
-        draw.multiline_text(
-            (margin + padding, content_y),
-            wrapped_content,
-            font=self.content_font,
-            fill="#1A1A1A",
-            spacing=20
-        )
-        
-        # 绘制配图
+        
+        content_y = margin + padding + header_height + px(16)
+        image_start_y = content_y + text_height + image_spacing
+        
+        # 版面按块排列（页眉、每行文字、每行配图），分页只在块之间进行
+        lines = wrapped_content.split('\n')
+        line_spacing = draw.textbbox((0, 0), "A", font=content_font)[3] + text_spacing
+        blocks = [('header', None, 0)]
+        blocks += [('line', i, content_y + i * line_spacing) for i in range(len(lines))]
+        
+        # 配图位置
+        placements = []
         if images:
-            image_start_y = content_y + text_height + image_spacing
-            
             if len(images) == 1:
-                if is_video_only:
-                    # 纯视频微博：左对齐显示，保持原始比例
-                    img_x = margin + padding  # 与文字左对齐
-                    canvas.paste(images[0], (img_x, image_start_y))
-                else:
-                    # 单张图片，左对齐显示，正方形
-                    img_x = margin + padding  # 与文字左对齐
-                    canvas.paste(images[0], (img_x, image_start_y))
+                # 单张图片或纯视频封面，与文字左对齐
+                placements.append((margin + padding, image_start_y))
             else:
-                # 多张图片网格布局 - 左对齐
+                # 多张图片网格布局 - 左对齐，从文字左边开始，不居中
                 cols = min(3, len(images))
-                rows = math.ceil(len(images) / cols)
-                gap = 8
-                
-                # 网格从文字左边开始，不居中
-                grid_start_x = margin + padding  # 与文字左对齐
-                grid_start_y = image_start_y
-                
-                for i, image in enumerate(images):
+                gap = px(8)
+                for i in range(len(images)):
                     col = i % cols
                     row = i // cols
-                    
                     # 精确计算每个图片的位置
-                    x = grid_start_x + col * (grid_image_size[0] + gap)
-                    y = grid_start_y + row * (grid_image_size[1] + gap)
-                    
-                    canvas.paste(image, (x, y))
-        
-        # 保存图片（超高清DPI）
-        canvas.save(output_path, quality=98, optimize=True, dpi=(400, 400))
-        print(f"✅ 超高清长图生成成功: {output_path}")
-        print(f"📊 图片信息: {width}x{total_height}px (DPI 400)")
+                    x = margin + padding + col * (grid_image_size[0] + gap)
+                    y = image_start_y + row * (grid_image_size[1] + gap)
+                    placements.append((x, y))
+            for row_top in sorted({y for _, y in placements}):
+                blocks.append(('images', row_top, row_top))
+        
+        # 切分页面：每页为虚拟长图中的一段 [起点, 终点)，续页顶部额外留出页边距
+        page_max_height = self.page_max_height
+        if not page_max_height or total_height <= page_max_height:
+            pages = [(0, total_height)]
+        else:
+            pages = []
+            page_start = 0
+            boundaries = [top for _, _, top in blocks[1:]] + [total_height]
+            for i, boundary in enumerate(boundaries):
+                top_pad = margin if pages else 0
+                page_limit = page_start + page_max_height - top_pad
+                next_boundary = boundaries[i + 1] if i + 1 < len(boundaries) else None
+                # 下一块放不下时在当前边界分页（单块超高时独占一页）
+                if next_boundary is not None and next_boundary > page_limit and boundary > page_start:
+                    pages.append((page_start, boundary))
+                    page_start = boundary
+            pages.append((page_start, total_height))
+            print(f"📄 长图高度 {total_height}px，分为 {len(pages)} 页（每页最多 {page_max_height}px）")
+        
+        root, ext = os.path.splitext(output_path)
+        output_paths = []
+        for page_index, (page_start, page_end) in enumerate(pages):
+            top_pad = margin if page_index > 0 else 0
+            dy = top_pad - page_start
+            page_lines = [block[1] for block in blocks if block[0] == 'line' and page_start <= block[2] < page_end]
+            
+            # 创建画布 - 使用更自然的背景色
+            canvas = Image.new("RGB", (width, page_end - page_start + top_pad), "#FAFAFA")
+            draw = ImageDraw.Draw(canvas)
+            
+            if page_start == 0:
+                # 粘贴带阴影的头像（阴影偏移按档位缩放，从头像图块的留边得出，兼容已缓存的图块）
+                shadow = (avatar.size[0] - avatar_size[0]) // 2
+                canvas.paste(avatar, (avatar_x - shadow, avatar_y - shadow), avatar)
+                # 用户名 - 使用更深的颜色增强对比度
+                draw.text((name_x, name_y), author_name, font=name_font, fill="#1A1A1A")
+                draw.text((name_x, time_y), formatted_time, font=time_font, fill="#666666")
+            
+            # 绘制正文内容 - 使用更深的颜色增强可读性
+            if len(pages) == 1:
+                draw.multiline_text(
+                    (margin + padding, content_y),
+                    wrapped_content,
+                    font=content_font,
+                    fill="#1A1A1A",
+                    spacing=text_spacing
+                )
+            else:
+                for i in page_lines:
+                    draw.text((margin + padding, content_y + i * line_spacing + dy), lines[i],
+                              font=content_font, fill="#1A1A1A")
+            
+            # 绘制配图：只解码本页的配图，贴上后即释放，控制内存占用
+            for i, (x, y) in enumerate(placements):
+                if images[i] is not None and page_start <= y < page_end:
+                    image = images[i]()
+                    canvas.paste(image, (x, y + dy))
+                    image.close()
+                    images[i] = None
+            
+            # 编码并保存图片（超出大小上限时自动降低质量），随后释放画布
+            page_path = output_path if len(pages) == 1 else f"{root}_p{page_index + 1}{ext}"
+            page_path, stats = self.encoder.save(canvas, page_path)
+            canvas.close()
+            del canvas, draw
+            self.last_encode_stats = stats
+            output_paths.append(page_path)
+            
+            page_label = f"（第 {page_index + 1}/{len(pages)} 页）" if len(pages) > 1 else ""
+            print(f"✅ 超高清长图生成成功{page_label}: {page_path}")
+            print(f"📊 图片信息: {width}x{page_end - page_start + top_pad}px | {stats['format'].upper()} 质量 {stats['quality']} | "
+                  f"{stats['bytes'] / 1024:.0f}KB | 编码耗时 {stats['encode_ms']:.0f}ms")
         
-        return output_path
+        return output_paths
+    
+    def generate_screenshot(self, channel_info, weibo_item, filename=None, output_prefix=None, profile=None):
+        """生成微博截图（高清版），返回第一页的输出路径（未分页时即完整长图）
+        
+        保留给只处理单个文件的旧调用方；分页时其余各页同样已保存，需要全部页面时使用 generate_pages
+        """
+        output_paths = self.generate_pages(channel_info, weibo_item, filename, output_prefix, profile)
+        if len(output_paths) > 1:
+            print(f"⚠️ 长图已分为 {len(output_paths)} 页，只返回第一页，其余各页: {', '.join(output_paths[1:])}")
+        return output_paths[0]
     
     def extract_channel_uid(self, channel_info):
         """提取频道UID"""
@@ -942,7 +1350,7 @@ class WeiboImageGenerator:
 
 
 def create_weibo_image(rss_url, index=0, output_filename=None):
-    """创建微博长图的便捷函数"""
+    """创建微博长图的便捷函数，返回各页输出路径的列表（超长微博按 page_max_height 分页）"""
     # 获取数据
     if not rss_url:
         raise ValueError("需要提供RSS URL")
@@ -961,4 +1369,4 @@ def create_weibo_image(rss_url, index=0, output_filename=None):
     
     # 生成长图
     generator = WeiboImageGenerator()
-    return generator.generate_screenshot(channel_info, weibo_items[index], output_filename)
+    return generator.generate_pages(channel_info, weibo_items[index], output_filename)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+长图编码模块
+支持 JPEG（色度抽样、渐进式）和 WebP 输出，可按目标文件大小自动二分查找质量
+"""
+
+import os
+import time
+import logging
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+WEBP_MAX_DIMENSION = 16383  # WebP 单边最大像素
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024  # 企业微信图片素材上限 10MB
+
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+
+
+class ImageEncoder:
+    """长图编码器"""
+
+    def __init__(self, fmt='jpeg', quality=98, subsampling='4:2:0', progressive=False, optimize=True,
+                 max_bytes=DEFAULT_MAX_BYTES, min_quality=40, dpi=(400, 400)):
+        fmt = fmt.lower()
+        if fmt == 'jpg':
+            fmt = 'jpeg'
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}")
+        self.format = fmt
+        self.quality = max(1, min(100, quality))
+        self.subsampling = subsampling
+        self.progressive = progressive
+        self.optimize = optimize  # JPEG优化霍夫曼表：画质不变，文件更小，编码稍慢
+        self.max_bytes = max_bytes  # 目标文件大小上限，0为不限制
+        self.min_quality = max(1, min(min_quality, self.quality))
+        self.dpi = dpi
+
+    def format_for(self, image):
+        """实际使用的格式：超出 WebP 尺寸限制的长图改用 JPEG"""
+        if self.format == 'webp' and max(image.size) > WEBP_MAX_DIMENSION:
+            return 'jpeg'
+        return self.format
+
+    @property
+    def extension(self):
+        return FORMATS[self.format][1]
+
+    def _encode_once(self, image, fmt, quality):
+        """按指定质量编码一次"""
+        if fmt == 'jpeg':
+            options = {'subsampling': self.subsampling, 'progressive': self.progressive,
+                       'optimize': self.optimize, 'dpi': self.dpi}
+        else:
+            options = {'method': 4}
+        buffer = BytesIO()
+        image.save(buffer, FORMATS[fmt][0], quality=quality, **options)
+        return buffer.getvalue()
+
+    def encode(self, image):
+        """编码图片，返回 (字节内容, 格式, 统计信息)
+
+        设置了 max_bytes 时，先按配置的质量编码，超出上限再在 [min_quality, quality) 区间
+        二分查找能满足上限的最高质量
+        """
+        start = time.perf_counter()
+        fmt = self.format_for(image)
+        attempts = 1
+        quality = self.quality
+        data = self._encode_once(image, fmt, quality)
+
+        if self.max_bytes and len(data) > self.max_bytes:
+            low, high = self.min_quality, self.quality - 1
+            best = None
+            results = {}
+            while low <= high:
+                mid = (low + high) // 2
+                results[mid] = self._encode_once(image, fmt, mid)
+                attempts += 1
+                if len(results[mid]) <= self.max_bytes:
+                    best = mid
+                    low = mid + 1
+                else:
+                    high = mid - 1
+            if best is None:
+                # 最低质量仍超出上限，使用最低质量的结果
+                best = self.min_quality
+                logger.warning(f"⚠️ 质量降到 {best} 仍超出大小上限: "
+                               f"{len(results.get(best, data)) / 1024 / 1024:.1f}MB")
+            quality = best
+            data = results.get(best, data)
+
+        stats = {
+            'format': fmt,
+            'quality': quality,
+            'bytes': len(data),
+            'encode_ms': round((time.perf_counter() - start) * 1000, 1),
+            'attempts': attempts,
+        }
+        return data, fmt, stats
+
+    def save(self, image, output_path):
+        """编码并写入文件，扩展名与实际格式一致；返回 (输出路径, 统计信息)"""
+        data, fmt, stats = self.encode(image)
+        root, ext = os.path.splitext(output_path)
+        valid_exts = ('.jpg', '.jpeg') if fmt == 'jpeg' else ('.webp',)
+        if ext.lower() not in valid_exts:
+            output_path = root + FORMATS[fmt][1]
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, output_path)
+        return output_path, stats
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+RSS条件请求缓存模块
+保存每个RSS源的 ETag / Last-Modified，下次请求时携带 If-None-Match / If-Modified-Since
+"""
+
+import os
+import json
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class FeedValidatorStore:
+    """RSS源验证器存储（线程安全，持久化到数据目录）"""
+
+    def __init__(self, data_dir):
+        self.file_path = os.path.join(data_dir, 'feed_validators.json')
+        self._lock = threading.Lock()
+        self._validators = self._load()  # 已确认处理完成的验证器
+        self._pending = {}  # 本次拉取到、尚未确认的验证器；None 表示响应没有验证器，确认后清除旧的验证器
+
+    def _load(self):
+        """加载验证器"""
+        try:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return data.get('feeds', {}) if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.error(f"⚠️ 加载RSS验证器失败: {e}")
+        return {}
+
+    def request_headers(self, rss_url):
+        """生成条件请求头"""
+        with self._lock:
+            validator = self._validators.get(rss_url, {})
+
+        headers = {}
+        if validator.get('etag'):
+            headers['If-None-Match'] = validator['etag']
+        if validator.get('last_modified'):
+            headers['If-Modified-Since'] = validator['last_modified']
+        return headers
+
+    def stage(self, rss_url, response_headers):
+        """记录本次响应的验证器，等待调用方处理完成后确认"""
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        with self._lock:
+            if etag or last_modified:
+                self._pending[rss_url] = {'etag': etag, 'last_modified': last_modified}
+            else:
+                self._pending[rss_url] = None
+
+    def commit(self, rss_url, channel_info=None):
+        """确认RSS内容已处理完成，之后的请求才会携带新的验证器；同时记下频道信息，供重启后收到304时使用"""
+        with self._lock:
+            if rss_url not in self._pending:
+                return
+            validator = self._pending.pop(rss_url)
+            if validator is None:
+                # 服务器不再返回验证器，继续携带旧的验证器可能一直收到过期内容的304
+                self._validators.pop(rss_url, None)
+            else:
+                validator['updated'] = datetime.now().isoformat()
+                if channel_info:
+                    validator['channel'] = {key: channel_info[key] for key in ('title', 'link', 'image_url')
+                                            if channel_info.get(key)}
+                self._validators[rss_url] = validator
+
+    def channel_info(self, rss_url):
+        """上次确认时记下的频道信息（没有时返回None）"""
+        with self._lock:
+            return self._validators.get(rss_url, {}).get('channel')
+
+    def save(self):
+        """保存已确认的验证器"""
+        with self._lock:
+            data = {
+                'feeds': dict(self._validators),
+                'last_update': datetime.now().isoformat()
+            }
+
+        try:
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            logger.error(f"⚠️ 保存RSS验证器失败: {e}")
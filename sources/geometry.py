@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+图片几何规划模块
+根据源图尺寸一次性算出裁剪区域和最终尺寸，每张图片只用一次 resize(box=...) 完成缩放和裁剪
+"""
+
+from PIL import Image
+
+
+def square_crop_plan(source_size, side):
+    """从中心裁剪为正方形：返回 (源图中的裁剪区域, 输出尺寸)"""
+    width, height = source_size
+    crop = min(width, height)
+    left = (width - crop) / 2
+    top = (height - crop) / 2
+    return (left, top, left + crop, top + crop), (side, side)
+
+
+def fit_plan(source_size, max_size):
+    """保持比例缩放到不超过 max_size：返回 (None, 输出尺寸)"""
+    width, height = source_size
+    ratio = min(max_size[0] / width, max_size[1] / height)
+    return None, (int(width * ratio), int(height * ratio))
+
+
+def poster_plan(source_size, max_width):
+    """纯视频微博的封面：过小时先放大到 max_width，再限制在 max_width 见方内
+
+    与逐步缩放得到的尺寸完全一致，但只需一次重采样
+    """
+    width, height = source_size
+    if width < max_width * 0.8:
+        scale_factor = max_width / width
+        width, height = int(width * scale_factor), int(height * scale_factor)
+    return fit_plan((width, height), (max_width, max_width))
+
+
+def apply_plan(img, plan):
+    """按规划执行一次重采样；尺寸和区域都不变时直接返回原图"""
+    box, size = plan
+    if size == img.size and (box is None or box == (0, 0, img.size[0], img.size[1])):
+        return img
+    return img.resize(size, Image.Resampling.LANCZOS, box=box)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+字形前进宽度表模块
+为每个字体预先计算ASCII、CJK等常用区段的字符宽度，保存在字体目录下，
+换行时用累加和计算行宽，避免逐字调用 FreeType
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+import PIL
+
+from font_manager import FONTS_DIR
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，没有时使用纯Python实现
+    np = None
+
+logger = logging.getLogger(__name__)
+
+TABLE_DIR = FONTS_DIR / ".advances"
+
+# 预先计算的码位区段 (起始, 结束)，左闭右开
+RANGES = (
+    (0x20, 0x7F),      # ASCII 可打印字符
+    (0x3000, 0x3040),  # CJK 符号和标点
+    (0x4E00, 0xA000),  # CJK 统一汉字
+    (0xFF00, 0xFFF0),  # 全角字符
+)
+
+
+class GlyphAdvanceTable:
+    """单个字体的字符宽度表（区段内用数组，区段外按需测量并缓存）"""
+
+    def __init__(self, font):
+        self.font = font
+        self.size = getattr(font, 'size', 16)
+        self._offsets = []
+        offset = 0
+        for start, end in RANGES:
+            self._offsets.append(offset)
+            offset += end - start
+        self._fallback = {}
+        self._lock = threading.Lock()
+        self.advances = self._load() or self._build()
+        if np is not None:
+            self._np_advances = np.frombuffer(self.advances.tobytes(), dtype=np.float32).astype(np.float64)
+
+    def _signature(self):
+        """字体文件、字号、Pillow版本和排版引擎共同决定字符宽度"""
+        path = getattr(self.font, 'path', None)
+        if not isinstance(path, str) or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{stat.st_size}|{int(stat.st_mtime)}|{self.size}|" \
+              f"{getattr(self.font, 'layout_engine', '')}|{PIL.__version__}"
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    def _table_path(self):
+        signature = self._signature()
+        if signature is None:
+            return None
+        name = os.path.splitext(os.path.basename(self.font.path))[0]
+        return TABLE_DIR / f"{name}-{self.size}-{signature[:12]}.adv"
+
+    def _load(self):
+        """读取已保存的宽度表"""
+        path = self._table_path()
+        if path is None or not path.exists():
+            return None
+        try:
+            advances = array('f')
+            with open(path, 'rb') as f:
+                advances.frombytes(f.read())
+            if len(advances) != sum(end - start for start, end in RANGES):
+                return None
+            return advances
+        except Exception as e:
+            logger.warning(f"⚠️ 读取字符宽度表失败: {e}")
+            return None
+
+    def _build(self):
+        """测量各区段字符宽度并保存"""
+        advances = array('f', (self.font.getlength(chr(cp)) for start, end in RANGES for cp in range(start, end)))
+        path = self._table_path()
+        if path is not None:
+            try:
+                os.makedirs(TABLE_DIR, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(advances.tobytes())
+                os.replace(tmp_path, path)
+                print(f"📐 已生成字符宽度表: {path.name}")
+            except OSError as e:
+                logger.warning(f"⚠️ 保存字符宽度表失败: {e}")
+        return advances
+
+    def _index(self, cp):
+        """码位在数组中的下标，不在预计算区段内返回-1"""
+        for (start, end), offset in zip(RANGES, self._offsets):
+            if start <= cp < end:
+                return offset + cp - start
+        return -1
+
+    def advance(self, char):
+        """单个字符的前进宽度"""
+        index = self._index(ord(char))
+        if index >= 0:
+            return self.advances[index]
+        width = self._fallback.get(char)
+        if width is None:
+            width = self.font.getlength(char)
+            with self._lock:
+                self._fallback[char] = width
+        return width
+
+    def prefix_widths(self, text):
+        """累计宽度：结果[i]为 text[:i] 的估算宽度，长度为 len(text) + 1"""
+        if np is not None and text:
+            codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+            widths = np.zeros(len(codepoints), dtype=np.float64)
+            missing = np.ones(len(codepoints), dtype=bool)
+            for (start, end), offset in zip(RANGES, self._offsets):
+                mask = (codepoints >= start) & (codepoints < end)
+                widths[mask] = self._np_advances[codepoints[mask] - start + offset]
+                missing &= ~mask
+            for i in np.flatnonzero(missing).tolist():
+                widths[i] = self.advance(text[i])
+            prefix = np.zeros(len(codepoints) + 1, dtype=np.float64)
+            np.cumsum(widths, out=prefix[1:])
+            return prefix.tolist()
+        return list(accumulate((self.advance(char) for char in text), initial=0.0))
+
+    @staticmethod
+    def fit_end(prefix, start, limit):
+        """从 start 开始、估算宽度不超过 limit 的最长前缀的结束下标"""
+        return bisect_right(prefix, prefix[start] + limit, lo=start) - 1
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端模块
+RSS拉取、图片下载和企业微信推送共用同一个连接池，复用TCP/TLS连接
+"""
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# 连接池配置
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))  # 缓存的主机连接池数量
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 10))  # 每个主机保持的最大连接数
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))  # 建立连接超时（秒）
+
+# 各类请求的读取超时（秒）
+READ_TIMEOUTS = {
+    'rss': 15,
+    'image': 15,
+    'wecom': 10,
+    'upload': 30,
+}
+
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _create_session():
+    """创建带连接池的会话"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session():
+    """获取当前进程共享的会话（子进程中会重新创建，避免共用父进程的连接）"""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _create_session()
+                _session_pid = pid
+    return _session
+
+
+def timeout_for(kind):
+    """获取请求类型对应的 (连接超时, 读取超时)"""
+    return (CONNECT_TIMEOUT, READ_TIMEOUTS.get(kind, 15))
+
+
+def get(url, kind='default', **kwargs):
+    """发送GET请求"""
+    kwargs.setdefault('timeout', timeout_for(kind))
+    return get_session().get(url, **kwargs)
+
+
+def post(url, kind='default', **kwargs):
+    """发送POST请求"""
+    kwargs.setdefault('timeout', timeout_for(kind))
+    return get_session().post(url, **kwargs)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+图片下载缓存模块
+按内容哈希保存下载过的图片，按规范化URL索引，超出容量时按最近最少使用淘汰；
+索引变化（含访问时间）先记在内存中，由 flush() 在每批下载结束和进程退出时写入磁盘
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import hashlib
+import threading
+import logging
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30 * 86400  # 响应没有缓存头时的有效期（微博图片地址内容不变）
+
+# 新浪图床的分片域名（wx1~wx4、tvax1~tvax4等）内容相同
+_SINAIMG_SHARD = re.compile(r'^([a-z]+)\d+(\.sinaimg\.cn)$')
+
+
+def normalize_url(url):
+    """规范化图片URL：统一大小写、去掉锚点；新浪图床合并分片域名并去掉签名参数"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    query = parts.query
+    if host.endswith('.sinaimg.cn'):
+        host = _SINAIMG_SHARD.sub(r'\1\2', host)
+        query = ''
+    return urlunsplit((parts.scheme.lower(), host, parts.path, query, ''))
+
+
+def _expires_at(headers, now):
+    """根据 Cache-Control / Expires 计算过期时间，不允许缓存时返回None"""
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return now
+    match = re.search(r'max-age=(\d+)', cache_control)
+    if match:
+        return now + int(match.group(1))
+    if headers.get('Expires'):
+        try:
+            return parsedate_to_datetime(headers['Expires']).timestamp()
+        except Exception:
+            return now
+    return now + DEFAULT_TTL
+
+
+class MediaCache:
+    """图片字节缓存（线程安全，重启后保留）"""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._entries = self._load()  # 规范化URL -> 缓存信息
+        self._removed = set()  # 上次保存后本进程删除的条目
+        self._dirty = False  # 内存中的索引有未保存的变化
+        atexit.register(self.flush)
+
+    def _load(self):
+        """加载缓存索引"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return data.get('entries', {}) if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.error(f"⚠️ 加载图片缓存索引失败: {e}")
+        return {}
+
+    def _save(self):
+        """保存缓存索引（调用方持有锁）
+        
+        多个渲染进程共用同一个缓存目录，保存前合并其他进程写入的条目和更晚的访问时间
+        """
+        for key, entry in self._load().items():
+            current = self._entries.get(key)
+            if current is None:
+                if key not in self._removed:
+                    self._entries[key] = entry
+            elif current['hash'] == entry.get('hash'):
+                current['last_access'] = max(current.get('last_access', 0), entry.get('last_access', 0))
+        self._removed.clear()
+        try:
+            tmp_path = f"{self.index_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'entries': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_file)
+        except Exception as e:
+            logger.error(f"⚠️ 保存图片缓存索引失败: {e}")
+
+    def flush(self):
+        """把内存中的索引变化写入磁盘，没有变化时跳过"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._save()
+            self._dirty = False
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def get(self, url):
+        """读取缓存，返回 (内容, 是否仍在有效期内)；未命中返回 (None, False)"""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            entry['last_access'] = time.time()
+            self._dirty = True
+
+        try:
+            with open(self._object_path(entry['hash']), 'rb') as f:
+                content = f.read()
+        except OSError:
+            with self._lock:
+                self._entries.pop(key, None)
+                self._removed.add(key)
+                self._dirty = True
+            return None, False
+        return content, time.time() < entry.get('expires', 0)
+
+    def revalidation_headers(self, url):
+        """过期缓存的条件请求头"""
+        with self._lock:
+            entry = self._entries.get(normalize_url(url), {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def refresh(self, url, headers):
+        """服务器返回304时延长有效期"""
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            expires = _expires_at(headers, time.time())
+            if expires is None:
+                self._entries.pop(key)
+                self._removed.add(key)
+            else:
+                entry['expires'] = expires
+            self._dirty = True
+
+    def put(self, url, content, headers):
+        """写入缓存"""
+        now = time.time()
+        expires = _expires_at(headers, now)
+        if expires is None or not content or len(content) > self.max_bytes // 4:
+            return
+
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        try:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ 写入图片缓存失败: {e}")
+            return
+
+        with self._lock:
+            self._entries[normalize_url(url)] = {
+                'hash': digest,
+                'size': len(content),
+                'expires': expires,
+                'last_access': now,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+            }
+            self._evict()
+            self._dirty = True
+
+    def _evict(self):
+        """超出容量时按最近最少使用淘汰（调用方持有锁）"""
+        sizes = {entry['hash']: entry['size'] for entry in self._entries.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        # 同一内容可能被多个URL引用，引用计数归零时才删除文件
+        refs = Counter(entry['hash'] for entry in self._entries.values())
+
+        evicted = 0
+        for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1].get('last_access', 0)):
+            if total <= self.max_bytes:
+                break
+            del self._entries[key]
+            self._removed.add(key)
+            evicted += 1
+            refs[entry['hash']] -= 1
+            if refs[entry['hash']] == 0:
+                total -= entry['size']
+                try:
+                    os.remove(self._object_path(entry['hash']))
+                except OSError:
+                    pass
+        logger.info(f"🧹 图片缓存淘汰 {evicted} 条记录，当前占用 {total / (1024 * 1024):.1f}MB")
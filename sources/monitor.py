@@ -9,10 +9,24 @@ import time
 import logging
 import hashlib
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from typing import List, Dict, Set, Optional
-from create import RSSWeiboParser, WeiboImageGenerator
-from push import push_image_file
+from urllib.parse import urlparse
+from create import RSSWeiboParser, WeiboImageGenerator, RESOLUTION_PROFILES
+from feed_validators import FeedValidatorStore
+from media_cache import MediaCache
+from scheduler import FeedScheduler
+from render_pool import RenderPool
+from encoder import ImageEncoder
+from push import WeComNotifier
+from work_queue import WorkQueue
+import work_queue
+from push_queue import PushQueue
+from routing import load_routing
+import wecom_token
+import wecom_media
 
 
 class Config:
@@ -22,6 +36,39 @@ class Config:
         # RSS监听配置
         self.rss_urls = self._get_env_list('RSS_URLS', [])
         self.check_interval = int(os.getenv('CHECK_INTERVAL', 300))  # 默认5分钟
+        self.poll_workers = max(1, int(os.getenv('POLL_WORKERS', 8)))  # 并发拉取RSS的线程数，1为串行
+        self.poll_per_host = max(1, int(os.getenv('POLL_PER_HOST', 4)))  # 同一主机的最大并发请求数
+        self.conditional_get = os.getenv('CONDITIONAL_GET', 'true').lower() == 'true'  # ETag/Last-Modified条件请求
+        
+        # 自适应轮询配置（按发帖频率为每个RSS源单独安排拉取时间）
+        self.adaptive_polling = os.getenv('ADAPTIVE_POLLING', 'true').lower() == 'true'
+        self.min_poll_interval = int(os.getenv('MIN_POLL_INTERVAL', 60))
+        self.max_poll_interval = int(os.getenv('MAX_POLL_INTERVAL', 3600))
+        self.poll_jitter = float(os.getenv('POLL_JITTER', 0.1))  # 随机抖动比例
+        
+        # 长图生成配置
+        self.media_download_workers = int(os.getenv('MEDIA_DOWNLOAD_WORKERS', 6))  # 单条微博并发下载图片的线程数
+        self.media_download_budget = float(os.getenv('MEDIA_DOWNLOAD_BUDGET', 45))  # 单条微博图片下载总时限（秒）
+        self.media_cache_size_mb = int(os.getenv('MEDIA_CACHE_SIZE_MB', 500))  # 图片下载缓存容量，0为不缓存
+        self.avatar_prefetch = os.getenv('AVATAR_PREFETCH', 'true').lower() == 'true'  # 启动时和首次拉取到各频道时后台预取缺少的头像
+        self.render_workers = max(0, int(os.getenv('RENDER_WORKERS', 0)))  # 渲染长图的工作进程数，0为在主进程中渲染
+        
+        # 长图输出编码配置
+        self.output_format = os.getenv('OUTPUT_FORMAT', 'jpeg').lower()  # jpeg 或 webp
+        self.output_quality = int(os.getenv('OUTPUT_QUALITY', 98))  # 编码质量，调低可加快编码、减小文件
+        self.output_subsampling = os.getenv('OUTPUT_SUBSAMPLING', '4:2:0')  # JPEG色度抽样：4:4:4 / 4:2:2 / 4:2:0
+        self.output_progressive = os.getenv('OUTPUT_PROGRESSIVE', 'false').lower() == 'true'  # 渐进式JPEG（文件更小，编码更慢）
+        self.output_optimize = os.getenv('OUTPUT_OPTIMIZE', 'true').lower() == 'true'  # JPEG优化霍夫曼表（画质不变，文件更小，编码稍慢）
+        self.output_max_mb = float(os.getenv('OUTPUT_MAX_MB', 10))  # 长图大小上限，超出时自动降低质量，0为不限制
+        self.output_min_quality = int(os.getenv('OUTPUT_MIN_QUALITY', 40))  # 自动降低质量的下限
+        self.page_max_height = int(os.getenv('PAGE_MAX_HEIGHT', 10000))  # 单页长图最大高度（像素），超出时分页，0为不分页
+        
+        # 分辨率档位（1x/2x/3x，3x为超高清宽2400px），可按RSS源单独设置：UID或RSS地址:档位
+        self.render_profile = os.getenv('RENDER_PROFILE', '3x').lower()
+        self.render_profile_overrides = {
+            key.strip(): profile.strip().lower()
+            for key, profile in (entry.rsplit(':', 1) for entry in self._get_env_list('RENDER_PROFILE_OVERRIDES', []) if ':' in entry)
+        }
         
         # 企业微信配置
         self.wecom_corpid = os.getenv('WECOM_CORPID', '')
@@ -30,6 +77,14 @@ class Config:
         self.wecom_touser = os.getenv('WECOM_TOUSER', '@all')
         self.wecom_toparty = os.getenv('WECOM_TOPARTY', '')
         self.wecom_totag = os.getenv('WECOM_TOTAG', '')
+        # 推送路由配置文件：按RSS源/频道UID推送给不同接收者或不同企业微信应用，不存在时全部推送给上面的默认接收者
+        self.routes_file = os.getenv('ROUTES_FILE', '/app/data/routes.json')
+        
+        # 推送队列配置（长图生成后交给推送线程上传和发送，不阻塞渲染和RSS拉取）
+        self.push_workers = max(0, int(os.getenv('PUSH_WORKERS', 2)))  # 推送线程数，0为生成后立即在当前线程推送
+        self.push_queue_size = max(1, int(os.getenv('PUSH_QUEUE_SIZE', 100)))  # 队列上限，满时等待推送线程处理
+        self.push_rate_per_minute = float(os.getenv('PUSH_RATE_PER_MINUTE', 30))  # 每分钟最多推送的图片数，0为不限速
+        self.push_burst = max(1, int(os.getenv('PUSH_BURST', 5)))  # 令牌桶容量（允许的短时突发数）
         
         # seen_items.json 清理配置
         self.seen_items_max_count_per_channel = int(os.getenv('SEEN_ITEMS_MAX_COUNT_PER_CHANNEL', 50))
@@ -61,14 +116,41 @@ class Config:
         """检查企业微信是否配置完整"""
         return bool(self.wecom_corpid and self.wecom_corpsecret and self.wecom_agentid)
     
+    def load_routing(self):
+        """加载推送路由表，配置有误时抛出 ValueError"""
+        default_app = {
+            'corpid': self.wecom_corpid,
+            'corpsecret': self.wecom_corpsecret,
+            'agentid': self.wecom_agentid
+        } if self.is_wecom_configured() else None
+        return load_routing(self.routes_file, default_app,
+                            (self.wecom_touser, self.wecom_toparty, self.wecom_totag))
+    
     def validate(self) -> bool:
         """验证配置"""
         if not self.rss_urls:
             logging.error("❌ 未配置RSS地址，请设置 RSS_URLS 环境变量")
             return False
         
-        if not self.is_wecom_configured():
+        try:
+            routing = self.load_routing()
+        except ValueError as e:
+            logging.error(f"❌ 推送路由配置有误: {e}")
+            return False
+        
+        if not routing.apps:
             logging.warning("⚠️ 企业微信配置不完整，将跳过推送功能")
+        elif self.output_format == 'webp':
+            logging.warning("⚠️ 企业微信图片消息只支持JPG/PNG，WebP长图可能推送失败，建议使用 OUTPUT_FORMAT=jpeg")
+        
+        for profile in [self.render_profile, *self.render_profile_overrides.values()]:
+            if profile not in RESOLUTION_PROFILES:
+                logging.error(f"❌ 未知的分辨率档位: {profile}，可选: {', '.join(RESOLUTION_PROFILES)}")
+                return False
+        
+        if self.output_format not in ('jpeg', 'jpg', 'webp'):
+            logging.error(f"❌ 不支持的输出格式: {self.output_format}，请设置为 jpeg 或 webp")
+            return False
         
         return True
 
@@ -81,12 +163,83 @@ class WeiboMonitor:
         self.seen_items: Set[str] = set()
         self.seen_items_with_time: Dict[str, Dict] = {}  # 新增：保存item的时间戳和RSS源信息
         self.rss_parser = RSSWeiboParser()
-        self.image_generator = WeiboImageGenerator()
+        self.validator_store = FeedValidatorStore(config.data_dir) if config.conditional_get else None
+        # 持久化工作队列：记录每条新微博的处理阶段，重启或失败后从最后完成的阶段继续
+        self.work_queue = WorkQueue(config.data_dir, max_retries=config.max_retries)
+        self._active_lock = threading.Lock()
+        self._active_jobs: Set[str] = set()  # 正在渲染或推送中的任务，避免重复恢复
+        # 企业微信访问令牌和已上传图片的 media_id 保存到数据目录，重启后继续使用
+        wecom_token.configure(config.data_dir)
+        wecom_media.configure(config.data_dir)
+        media_cache_dir = os.path.join(config.data_dir, 'media_cache') if config.media_cache_size_mb > 0 else None
+        media_cache_bytes = config.media_cache_size_mb * 1024 * 1024
+        generator_kwargs = {
+            'media_workers': config.media_download_workers,
+            'media_budget': config.media_download_budget,
+            'avatar_cache_dir': os.path.join(config.data_dir, 'avatars'),
+            'encoder': ImageEncoder(
+                config.output_format,
+                quality=config.output_quality,
+                subsampling=config.output_subsampling,
+                progressive=config.output_progressive,
+                optimize=config.output_optimize,
+                max_bytes=int(config.output_max_mb * 1024 * 1024),
+                min_quality=config.output_min_quality
+            ),
+            'page_max_height': config.page_max_height,
+            'profile': config.render_profile,
+        }
+        self.image_generator = WeiboImageGenerator(
+            media_cache=MediaCache(media_cache_dir, media_cache_bytes) if media_cache_dir else None,
+            **generator_kwargs
+        )
+        # 渲染进程池：各工作进程使用各自的生成器，共享磁盘上的图片缓存和头像缓存
+        self.render_pool = RenderPool(
+            config.render_workers,
+            generator_kwargs=generator_kwargs,
+            media_cache_dir=media_cache_dir,
+            media_cache_bytes=media_cache_bytes
+        ) if config.render_workers > 0 else None
+        # 渲染完成后在单独的线程中记录和推送，轮询不等待渲染结果，未完成的渲染跨轮次保留
+        self._render_finisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render-finish') \
+            if self.render_pool else None
+        # 推送路由：每个企业微信应用一个通知器，同一张图每个应用只上传一次
+        self.routing = config.load_routing()
+        self.notifiers = {
+            name: WeComNotifier(app['corpid'], app['corpsecret'], app['agentid'])
+            for name, app in self.routing.apps.items()
+        }
+        # 推送队列：同一接收者的消息按顺序发送，按企业微信应用的消息频率限速
+        self.push_queue = PushQueue(
+            workers=config.push_workers,
+            max_size=config.push_queue_size,
+            rate_per_minute=config.push_rate_per_minute,
+            burst=config.push_burst
+        ) if config.push_workers > 0 and self.notifiers else None
+        self.scheduler = FeedScheduler(
+            config.rss_urls,
+            config.data_dir,
+            base_interval=config.check_interval,
+            min_interval=config.min_poll_interval,
+            max_interval=config.max_poll_interval,
+            jitter=config.poll_jitter
+        ) if config.adaptive_polling else None
+        
+        # 并发拉取时保护seen_items，并按主机限制并发
+        self._seen_lock = threading.Lock()
+        self._host_lock = threading.Lock()
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        
+        # 头像预取：复用轮询解析出的频道信息，每个RSS源只检查一次，缺少头像时在后台线程中下载
+        self._avatar_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatar-prefetch') \
+            if config.avatar_prefetch else None
+        self._avatar_feeds: Set[str] = set()
         
         # 加载已见过的微博ID
         self._load_seen_items()
         
-        # seen_items清理计数器
+        # 清理计数器
+        self.cleanup_counter = 0
         self.seen_cleanup_counter = 0
         
         # 设置日志
@@ -251,41 +404,89 @@ class WeiboMonitor:
             return "unknown"
     
     def _generate_item_id(self, rss_url: str, item: Dict) -> str:
-        """生成微博项目的唯一ID"""
+        """按内容生成的旧版微博ID（兼容旧的seen_items记录，或条目缺少链接时使用）"""
         # 使用RSS URL、发布时间和内容的哈希作为唯一标识
         content = f"{rss_url}_{item.get('pub_date', '')}_{item.get('content', '')[:100]}"
         return hashlib.md5(content.encode('utf-8')).hexdigest()
     
+    def _host_semaphore(self, rss_url: str) -> threading.BoundedSemaphore:
+        """获取RSS地址所在主机的并发信号量"""
+        host = urlparse(rss_url).netloc.lower()
+        with self._host_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.config.poll_per_host)
+                self._host_semaphores[host] = semaphore
+            return semaphore
+    
+    def _generate_item_key(self, rss_url: str, item: Dict) -> Optional[str]:
+        """根据链接/GUID和发布时间生成微博ID，无需解析正文；缺少链接时返回None"""
+        identity = item.get('guid') or item.get('link')
+        if not identity:
+            return None
+        content = f"{rss_url}_{identity}_{item.get('pub_date', '')}"
+        return hashlib.md5(content.encode('utf-8')).hexdigest()
+    
     def _check_rss_updates(self, rss_url: str) -> List[Dict]:
-        """检查单个RSS地址的更新"""
+        """检查单个RSS地址的更新（可在工作线程中并发调用）"""
         try:
             logging.info(f"🔍 检查RSS更新: {rss_url}")
             
-            # 获取RSS数据
-            xml_content = self.rss_parser.fetch_rss_data(rss_url)
+            # 获取RSS数据（受单主机并发上限约束）
+            with self._host_semaphore(rss_url):
+                xml_content = self.rss_parser.fetch_rss_data(rss_url, self.validator_store)
+            if xml_content is RSSWeiboParser.NOT_MODIFIED:
+                # 内容未变化，跳过解析和比对
+                return []
             if not xml_content:
                 logging.warning(f"⚠️ 无法获取RSS数据: {rss_url}")
                 return []
             
-            # 解析RSS
-            channel_info, weibo_items = self.rss_parser.parse_rss_xml(xml_content)
-            if not weibo_items:
+            # 解析RSS：先只读取标识字段，已见过的微博不再提取正文、图片和视频
+            identities = []
+            
+            def is_unseen(identity):
+                identities.append(identity)
+                item_key = self._generate_item_key(rss_url, identity)
+                return item_key is None or item_key not in self.seen_items
+            
+            channel_info, weibo_items = self.rss_parser.parse_rss_xml(xml_content, item_filter=is_unseen)
+            self._queue_avatar_prefetch(rss_url, channel_info)
+            if self.scheduler:
+                self.scheduler.record_posts(rss_url, [identity['pub_date'] for identity in identities])
+            if not identities:
                 logging.warning(f"⚠️ RSS中未找到微博数据: {rss_url}")
                 return []
             
             # 检查新微博
             new_items = []
-            for item in weibo_items:
-                item_id = self._generate_item_id(rss_url, item)
-                if item_id not in self.seen_items:
+            channel_uid = self._extract_channel_uid(channel_info, rss_url) if weibo_items else None
+            with self._seen_lock:
+                for item in weibo_items:
+                    legacy_id = self._generate_item_id(rss_url, item)
+                    item_id = self._generate_item_key(rss_url, item) or legacy_id
+                    if item_id in self.seen_items:
+                        continue
+                    if legacy_id in self.seen_items:
+                        # 旧版本按内容生成的ID，迁移为新ID，避免重复推送
+                        self.seen_items.discard(legacy_id)
+                        self.seen_items.add(item_id)
+                        self.seen_items_with_time[item_id] = self.seen_items_with_time.pop(legacy_id, {
+                            'timestamp': datetime.now().isoformat(),
+                            'rss_url': rss_url,
+                            'channel_uid': channel_uid
+                        })
+                        continue
+                    
                     # 添加RSS源信息
                     item['rss_url'] = rss_url
                     item['channel_info'] = channel_info
                     item['item_id'] = item_id
-                    new_items.append(item)
                     self.seen_items.add(item_id)
-                    # 提取频道ID并保存时间戳和RSS源信息
-                    channel_uid = self._extract_channel_uid(channel_info, rss_url)
+                    # 立即写入工作队列；已在队列中的（seen_items 未及保存时进程退出）由队列恢复，不重复处理
+                    if self.work_queue.add(item):
+                        new_items.append(item)
+                    # 保存时间戳、RSS源和频道信息
                     self.seen_items_with_time[item_id] = {
                         'timestamp': datetime.now().isoformat(),
                         'rss_url': rss_url,
@@ -295,14 +496,32 @@ class WeiboMonitor:
             if new_items:
                 logging.info(f"🆕 发现 {len(new_items)} 条新微博: {rss_url}")
             
+            # 比对完成后才确认验证器，处理失败时下次仍会完整拉取
+            if self.validator_store:
+                self.validator_store.commit(rss_url, channel_info)
+            
             return new_items
             
         except Exception as e:
             logging.error(f"❌ 检查RSS更新失败 {rss_url}: {e}")
             return []
     
-    def _process_new_weibo(self, item: Dict) -> Optional[str]:
-        """处理新微博，生成长图"""
+    def _feed_keys(self, rss_url: str, channel_info: Dict) -> List[str]:
+        """按RSS源单独配置时可用的匹配键：RSS地址、频道UID、RSS地址末段"""
+        return [rss_url, self.image_generator.extract_channel_uid(channel_info),
+                urlparse(rss_url).path.rstrip('/').rsplit('/', 1)[-1]]
+    
+    def _render_profile(self, rss_url: str, channel_info: Dict) -> str:
+        """RSS源使用的分辨率档位（按RSS地址、频道UID或RSS地址末段匹配单独设置）"""
+        overrides = self.config.render_profile_overrides
+        if overrides:
+            for key in self._feed_keys(rss_url, channel_info):
+                if key in overrides:
+                    return overrides[key]
+        return self.config.render_profile
+    
+    def _process_new_weibo(self, item: Dict) -> List[str]:
+        """处理新微博，生成长图（超长微博分为多页），返回各页文件路径"""
         try:
             rss_url = item['rss_url']
             channel_info = item['channel_info']
@@ -310,132 +529,366 @@ class WeiboMonitor:
             logging.info(f"🎨 开始处理新微博: {item.get('content', '')[:50]}...")
             
             # 生成长图（使用新的规范命名）
-            output_file = self.image_generator.generate_screenshot(
+            output_files = self.image_generator.generate_pages(
                 channel_info, 
-                item
+                item,
+                profile=self._render_profile(rss_url, channel_info)
             )
             
-            logging.info(f"✅ 长图生成成功: {output_file}")
-            return output_file
+            logging.info(f"✅ 长图生成成功: {', '.join(output_files)}")
+            return output_files
             
         except Exception as e:
             logging.error(f"❌ 处理新微博失败: {e}")
-            return None
+            return []
     
-    def _push_to_wecom(self, image_file: str, item: Dict) -> bool:
-        """推送到企业微信"""
-        if not self.config.is_wecom_configured():
+    def _start_job(self, item: Dict, stage: str):
+        """从任务所处的阶段继续处理：detected 阶段开始渲染，已渲染的直接推送
+        
+        提交到渲染进程池时立即返回，渲染完成后由 _on_pool_render_done 接着推送
+        """
+        item_id = item['item_id']
+        with self._active_lock:
+            self._active_jobs.add(item_id)
+        
+        if stage != work_queue.DETECTED:
+            pages = self.work_queue.pages(item_id)
+            if pages and all(page['sent'] or os.path.exists(page['file']) for page in pages):
+                self._deliver(item)
+                return
+            # 长图文件已被清理，重新渲染
+            self.work_queue.restart(item_id)
+        
+        if self.render_pool:
+            logging.info(f"🎨 提交渲染任务: {item.get('content', '')[:50]}...")
+            future = self.render_pool.submit(
+                item['channel_info'], item,
+                profile=self._render_profile(item['rss_url'], item['channel_info'])
+            )
+            future.add_done_callback(lambda done: self._on_pool_render_done(done, item))
+            return
+        # 未启用进程池时在主线程中生成长图，其余RSS源继续在后台拉取
+        self._finish_render(self._process_new_weibo(item), item)
+    
+    def _finish_render(self, image_files: List[str], item: Dict):
+        """长图渲染完成：记录到工作队列后推送；渲染失败时安排重试"""
+        if not image_files:
+            self._job_failed(item, "长图生成失败")
+            return
+        self.work_queue.mark_rendered(item['item_id'], image_files)
+        self._deliver(item)
+    
+    def _on_pool_render_done(self, future, item: Dict):
+        """渲染任务结束的回调（在进程池的管理线程中调用），记录和推送转交给 render-finish 线程"""
+        if future.cancelled():
+            # 服务关闭时取消的渲染不计失败，下次启动时从工作队列恢复
+            self._job_done(item['item_id'])
+            return
+        try:
+            self._render_finisher.submit(self._finish_pool_render, future, item)
+        except RuntimeError:
+            self._job_done(item['item_id'])
+    
+    def _finish_pool_render(self, future, item: Dict):
+        """进程池渲染完成后推送"""
+        try:
+            image_files = future.result()
+        except Exception as e:
+            logging.error(f"❌ 处理新微博失败: {e}")
+            image_files = []
+        
+        if image_files:
+            logging.info(f"✅ 长图生成成功: {', '.join(image_files)}")
+        self._finish_render(image_files, item)
+    
+    def _job_failed(self, item: Dict, error: str):
+        """任务失败：未超过 MAX_RETRIES 时保留已完成的阶段，稍后重试
+        
+        同一轮推送中多个推送目标都失败时只计一次失败
+        """
+        item_id = item['item_id']
+        with self._active_lock:
+            if item_id not in self._active_jobs:
+                return
+            self._active_jobs.discard(item_id)
+        if self.work_queue.mark_failed(item_id, error):
+            logging.warning(f"🔁 {error}，稍后重试: {item.get('content', '')[:30]}...")
+        else:
+            logging.error(f"❌ {error}，已达到最大重试次数 {self.config.max_retries}，放弃: "
+                          f"{item.get('content', '')[:30]}...")
+    
+    def _job_done(self, item_id: str):
+        with self._active_lock:
+            self._active_jobs.discard(item_id)
+    
+    def _deliver(self, item: Dict):
+        """把未发送的各页长图推送给路由匹配的所有目标
+        
+        启用推送队列时入队后立即返回；不同目标并行推送，同一目标按页序逐张推送
+        """
+        item_id = item['item_id']
+        targets = self.routing.targets_for(self._feed_keys(item['rss_url'], item['channel_info']))
+        if not targets:
             logging.warning("⚠️ 企业微信未配置，跳过推送")
+            self.work_queue.complete(item_id)
+            self._job_done(item_id)
+            return
+        
+        unsent = [(index, page) for index, page in enumerate(self.work_queue.pages(item_id)) if not page['sent']]
+        if self.push_queue is None:
+            # 逐页推送，每一页同时发给所有目标，有目标失败时停止，等待整条微博重试
+            with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix='wecom-push') as executor:
+                for index, _ in unsent:
+                    results = executor.map(lambda target: self._push_page(item, index, target, targets), targets)
+                    if not all(list(results)):
+                        break
+            return
+        
+        for index, page in unsent:
+            for target in targets:
+                if target.key not in page.get('sent_to', []):
+                    self.push_queue.submit(target.key, self._push_page, item, index, target, targets,
+                                           bucket=target.app)
+    
+    def _log_push_stats(self):
+        """输出推送队列统计"""
+        stats = self.push_queue.stats()
+        if stats['submitted']:
+            logging.info(f"📊 推送队列: 当前 {stats['depth']} 条（最多 {stats['max_depth']} 条），"
+                         f"成功 {stats['succeeded']}，失败 {stats['failed']}，"
+                         f"平均排队 {stats['avg_wait']:.1f} 秒，最长 {stats['max_wait']:.1f} 秒")
+    
+    def _push_page(self, item: Dict, index: int, target, targets) -> bool:
+        """推送一页长图给一个推送目标：该应用已上传过且素材未过期时直接发送，每一步完成后立即记录"""
+        item_id = item['item_id']
+        pages = self.work_queue.pages(item_id)
+        if index >= len(pages) or target.key in pages[index].get('sent_to', []):
+            return True
+        if not all(page['sent'] or target.key in page.get('sent_to', []) for page in pages[:index]):
+            # 前面的页推送失败，等待整条微博重试，避免乱序
             return False
+        page = pages[index]
+        notifier = self.notifiers[target.app]
         
         try:
-            logging.info(f"📤 推送到企业微信: {image_file}")
+            logging.info(f"📤 推送到企业微信 {target.describe()}: {page['file']}")
             
-            success = push_image_file(
-                image_file,
-                corpid=self.config.wecom_corpid,
-                corpsecret=self.config.wecom_corpsecret,
-                agentid=self.config.wecom_agentid,
-                touser=self.config.wecom_touser,
-                toparty=self.config.wecom_toparty,
-                totag=self.config.wecom_totag
-            )
+            # 同一应用内相同内容的图片只上传一次，有效期内直接复用 media_id
+            media_id = notifier.media_id_for(page['file'])
+            if not media_id:
+                self._job_failed(item, "企业微信图片上传失败")
+                return False
+            if media_id != page.get('media_ids', {}).get(target.app):
+                self.work_queue.mark_uploaded(item_id, index, target.app, media_id,
+                                              {t.app for t in targets})
             
-            if success:
-                logging.info("✅ 企业微信推送成功")
-            else:
-                logging.error("❌ 企业微信推送失败")
+            if not notifier.send_image(page['file'], media_id, target.touser, target.toparty, target.totag):
+                self._job_failed(item, "企业微信消息发送失败")
+                return False
             
-            return success
+            logging.info(f"✅ 企业微信推送成功: {target.describe()}")
+            page_sent, finished = self.work_queue.mark_sent(item_id, index, target.key,
+                                                           [t.key for t in targets])
+            if finished:
+                self._job_done(item_id)
+            if page_sent:
+                self._mark_pushed(page['file'])
+            return True
             
         except Exception as e:
-            logging.error(f"❌ 企业微信推送异常: {e}")
+            self._job_failed(item, f"企业微信推送异常: {e}")
             return False
     
-    def run_once(self):
-        """执行一次监听检查"""
-        logging.info("🔄 开始检查所有RSS源...")
+    def _mark_pushed(self, image_file: str):
+        """标记图片用于后续清理"""
+        try:
+            from cleanup import mark_image_pushed
+            mark_image_pushed(image_file)
+        except Exception as e:
+            logging.warning(f"⚠️ 标记图片清理失败: {e}")
+    
+    def run_once(self, rss_urls: Optional[List[str]] = None):
+        """执行一次监听检查（并发拉取所有RSS源，或只拉取指定的RSS源）"""
+        rss_urls = self.config.rss_urls if rss_urls is None else rss_urls
+        logging.info(f"🔄 开始检查 {len(rss_urls)} 个RSS源...")
         
         total_new_items = 0
+        workers = min(self.config.poll_workers, len(rss_urls)) or 1
         
-        for rss_url in self.config.rss_urls:
-            try:
-                # 检查RSS更新
-                new_items = self._check_rss_updates(rss_url)
-                total_new_items += len(new_items)
-                
-                # 处理每个新微博
-                for item in new_items:
-                    # 生成长图
-                    image_file = self._process_new_weibo(item)
-                    if image_file:
-                        # 推送到企业微信
-                        self._push_to_wecom(image_file, item)
-                
-                # 短暂延迟，避免请求过于频繁
-                if new_items:
-                    time.sleep(2)
+        # 所有RSS源并发拉取和比对，哪个先返回就先处理哪个，单个慢源不再拖慢其他源；
+        # 启用渲染进程池时新微博交给进程池渲染，本轮不等待渲染完成，哪条先渲染完成就先推送
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rss-poll') as executor:
+            polls = {
+                executor.submit(self._check_rss_updates, rss_url): rss_url
+                for rss_url in rss_urls
+            }
+            
+            # 先恢复上次未完成或到了重试时间的任务，从最后完成的阶段继续（仍在渲染或推送中的除外）
+            with self._active_lock:
+                active = set(self._active_jobs)
+            resumed = self.work_queue.due(exclude=active)
+            if resumed:
+                logging.info(f"♻️ 恢复 {len(resumed)} 个未完成的任务")
+            for item, stage in resumed:
+                self._start_job(item, stage)
+            
+            for future in as_completed(polls):
+                rss_url = polls[future]
+                # 无论成功与否都重新排入调度队列
+                if self.scheduler:
+                    self.scheduler.complete(rss_url)
+                try:
+                    new_items = future.result()
+                    total_new_items += len(new_items)
                     
-            except Exception as e:
-                logging.error(f"❌ 处理RSS源失败 {rss_url}: {e}")
+                    for item in new_items:
+                        self._start_job(item, work_queue.DETECTED)
+                        
+                except Exception as e:
+                    logging.error(f"❌ 处理RSS源失败 {rss_url}: {e}")
         
-        # 保存已见过的微博ID
+        # 保存已见过的微博ID，随后保存RSS验证器
         self._save_seen_items()
+        if self.validator_store:
+            self.validator_store.save()
+        if self.scheduler:
+            self.scheduler.save()
         
         if total_new_items > 0:
             logging.info(f"✅ 本次检查完成，处理了 {total_new_items} 条新微博")
         else:
             logging.info("✅ 本次检查完成，无新微博")
+        if self.push_queue:
+            self._log_push_stats()
+    
+    def _queue_avatar_prefetch(self, rss_url: str, channel_info: Optional[Dict]):
+        """首次解析到某个RSS源的频道信息时，在后台预取缺少的头像，避免该账号的第一条微博等待头像下载"""
+        if not self._avatar_executor or not channel_info or not channel_info.get('image_url'):
+            return
+        with self._seen_lock:
+            if rss_url in self._avatar_feeds:
+                return
+            self._avatar_feeds.add(rss_url)
+        self._avatar_executor.submit(self._prefetch_avatar, rss_url, channel_info)
+    
+    def _seed_avatar_prefetch(self):
+        """启动时按上次记下的频道信息预取头像（验证器未变时首轮拉取都是304，不会解析到频道信息）"""
+        if not self._avatar_executor or not self.validator_store:
+            return
+        for rss_url in self.config.rss_urls:
+            self._queue_avatar_prefetch(rss_url, self.validator_store.channel_info(rss_url))
+    
+    def _prefetch_avatar(self, rss_url: str, channel_info: Dict):
+        """预取单个频道的头像（已缓存时跳过）"""
+        try:
+            if self.image_generator.prefetch_avatar(channel_info, self._render_profile(rss_url, channel_info)):
+                logging.info(f"🖼️ 已预取频道头像: {channel_info.get('title', rss_url)}")
+        except Exception as e:
+            logging.warning(f"⚠️ 预取头像失败 {rss_url}: {e}")
+    
+    def _run_maintenance(self):
+        """定期维护任务（每个检查间隔执行一次）"""
+        # 清理间隔
+        cleanup_interval = 24  # 每24次检查（大约一天）运行一次清理
+        # seen_items清理间隔（根据配置，默认每7天清理一次）
+        seen_cleanup_interval = max(1, self.config.seen_items_cleanup_interval * 24)  # 转换为检查次数
+        
+        # 定期运行清理任务
+        self.cleanup_counter += 1
+        if self.cleanup_counter >= cleanup_interval:
+            try:
+                logging.info("🧹 开始定期清理任务...")
+                from cleanup import run_cleanup
+                run_cleanup()
+                pruned = self.work_queue.prune()
+                if pruned:
+                    logging.info(f"🧹 工作队列删除了 {pruned} 个已结束的任务")
+                self.cleanup_counter = 0
+            except Exception as e:
+                logging.error(f"⚠️ 清理任务失败: {e}")
+        
+        # 定期清理seen_items
+        self.seen_cleanup_counter += 1
+        if self.seen_cleanup_counter >= seen_cleanup_interval:
+            try:
+                logging.info("🧹 开始清理seen_items...")
+                if self._cleanup_seen_items():
+                    self._save_seen_items()
+                self.seen_cleanup_counter = 0
+            except Exception as e:
+                logging.error(f"⚠️ seen_items清理失败: {e}")
+    
+    def _run_fixed_interval(self):
+        """固定间隔轮询：每次检查所有RSS源"""
+        while True:
+            self.run_once()
+            self._run_maintenance()
+            
+            # 等待下次检查
+            logging.info(f"⏳ 等待 {self.config.check_interval} 秒后进行下次检查...")
+            time.sleep(self.config.check_interval)
+    
+    def _run_adaptive(self):
+        """自适应轮询：只拉取已到期的RSS源，维护任务仍按检查间隔执行"""
+        last_maintenance = time.time()
+        while True:
+            due_urls = self.scheduler.pop_due()
+            if due_urls:
+                self.run_once(due_urls)
+            
+            if time.time() - last_maintenance >= self.config.check_interval:
+                self._run_maintenance()
+                last_maintenance = time.time()
+            
+            # 等待下一个RSS源到期
+            wait = min(self.scheduler.seconds_until_next(), self.config.check_interval)
+            if wait > 0:
+                logging.debug(f"⏳ 等待 {wait:.0f} 秒后拉取下一个到期的RSS源...")
+                time.sleep(wait)
     
     def run(self):
         """启动监听服务"""
         logging.info("🚀 微博RSS监听服务启动")
         logging.info(f"📋 监听RSS源: {len(self.config.rss_urls)} 个")
-        logging.info(f"⏰ 检查间隔: {self.config.check_interval} 秒")
-        logging.info(f"📤 企业微信推送: {'已配置' if self.config.is_wecom_configured() else '未配置'}")
-        
-        # 清理计数器
-        cleanup_counter = 0
-        cleanup_interval = 24  # 每24次检查（大约一天）运行一次清理
-        
-        # seen_items清理间隔（根据配置，默认每7天清理一次）
-        seen_cleanup_interval = max(1, self.config.seen_items_cleanup_interval * 24)  # 转换为检查次数
+        if self.scheduler:
+            logging.info(f"⏰ 自适应轮询: 平均间隔 {self.config.check_interval} 秒，"
+                         f"范围 {self.config.min_poll_interval}-{self.config.max_poll_interval} 秒")
+        else:
+            logging.info(f"⏰ 检查间隔: {self.config.check_interval} 秒")
+        logging.info(f"🧵 并发拉取: {self.config.poll_workers} 线程，单主机最多 {self.config.poll_per_host} 并发")
+        if self.render_pool:
+            logging.info(f"🎨 渲染进程池: {self.config.render_workers} 个工作进程")
+        logging.info(f"📤 企业微信推送: {f'{len(self.notifiers)} 个应用' if self.notifiers else '未配置'}")
+        if self.routing.routes:
+            logging.info(f"🧭 推送路由: {len(self.routing.routes)} 条（{self.config.routes_file}）")
+        if self.push_queue:
+            rate = f"每分钟 {self.config.push_rate_per_minute:g} 张" if self.config.push_rate_per_minute > 0 else "不限速"
+            logging.info(f"📮 推送队列: {self.config.push_workers} 个推送线程，队列上限 {self.config.push_queue_size}，{rate}")
         
         try:
-            while True:
-                self.run_once()
-                
-                # 定期运行清理任务
-                cleanup_counter += 1
-                if cleanup_counter >= cleanup_interval:
-                    try:
-                        logging.info("🧹 开始定期清理任务...")
-                        from cleanup import run_cleanup
-                        run_cleanup()
-                        cleanup_counter = 0
-                    except Exception as e:
-                        logging.error(f"⚠️ 清理任务失败: {e}")
-                
-                # 定期清理seen_items
-                self.seen_cleanup_counter += 1
-                if self.seen_cleanup_counter >= seen_cleanup_interval:
-                    try:
-                        logging.info("🧹 开始清理seen_items...")
-                        if self._cleanup_seen_items():
-                            self._save_seen_items()
-                        self.seen_cleanup_counter = 0
-                    except Exception as e:
-                        logging.error(f"⚠️ seen_items清理失败: {e}")
-                
-                # 等待下次检查
-                logging.info(f"⏳ 等待 {self.config.check_interval} 秒后进行下次检查...")
-                time.sleep(self.config.check_interval)
+            self._seed_avatar_prefetch()
+            if self.scheduler:
+                self._run_adaptive()
+            else:
+                self._run_fixed_interval()
                 
         except KeyboardInterrupt:
             logging.info("👋 收到停止信号，正在关闭监听服务...")
         except Exception as e:
             logging.error(f"❌ 监听服务异常: {e}")
             raise
+        finally:
+            if self._avatar_executor:
+                self._avatar_executor.shutdown(wait=False, cancel_futures=True)
+            if self.render_pool:
+                self.render_pool.shutdown()
+                # 已渲染完成的任务记录并推送后再关闭推送队列
+                self._render_finisher.shutdown(wait=True)
+            if self.push_queue:
+                # 等待已入队的长图推送完成（最多60秒）
+                remaining = self.push_queue.shutdown(timeout=60)
+                if remaining:
+                    logging.warning(f"⚠️ 推送队列中还有 {remaining} 条未推送")
 
 
 def main():
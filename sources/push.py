@@ -4,67 +4,70 @@
 负责图片上传和消息推送功能
 """
 
-import requests
 import os
-import time
+import threading
+import mimetypes
+import http_client
+from wecom_token import get_token_manager, INVALID_TOKEN_ERRCODES
+from wecom_media import get_media_cache, file_digest, INVALID_MEDIA_ERRCODES
+
+mimetypes.add_type('image/webp', '.webp')  # 旧版本Python的mimetypes没有webp
 
 
 class WeComNotifier:
     """企业微信通知器"""
     
+    API_BASE = "https://qyapi.weixin.qq.com/cgi-bin"
+    
     def __init__(self, corpid, corpsecret, agentid):
         self.corpid = corpid
         self.corpsecret = corpsecret
         self.agentid = agentid
-        self.access_token = None
-        self.token_expires_time = 0
+        # 同一企业应用的所有通知器共用访问令牌，不再每次推送都调用 gettoken
+        self.token_manager = get_token_manager(corpid, corpsecret)
+        # 临时素材属于企业应用，同一应用内按图片内容复用 media_id
+        self.app_key = f"{corpid}:{agentid}"
+        self.media_cache = get_media_cache()
+        # 同一张图同时发给多个接收者时只上传一次：按内容哈希分段加锁，后到的线程等待后直接命中缓存
+        self._upload_locks = [threading.Lock() for _ in range(16)]
     
     def get_access_token(self):
         """获取访问令牌"""
-        current_time = time.time()
-        
-        # 如果token还没过期，直接返回
-        if self.access_token and current_time < self.token_expires_time:
-            return self.access_token
+        return self.token_manager.get()
+    
+    def _call_api(self, path, send):
+        """调用企业微信接口，返回响应JSON；令牌失效时作废令牌，重新获取后重试一次
         
-        try:
-            url = "https://qyapi.weixin.qq.com/cgi-bin/gettoken"
-            params = {
-                'corpid': self.corpid,
-                'corpsecret': self.corpsecret
-            }
+        send(url) 发送请求并返回响应，重试时会再次调用
+        """
+        for attempt in range(2):
+            access_token = self.get_access_token()
+            if not access_token:
+                return None
             
-            response = requests.get(url, params=params, timeout=10)
+            response = send(f"{self.API_BASE}/{path}?access_token={access_token}")
             response.raise_for_status()
             data = response.json()
             
-            if data.get('errcode') == 0:
-                self.access_token = data['access_token']
-                self.token_expires_time = current_time + data['expires_in'] - 60  # 提前60秒过期
-                print("✅ 企业微信访问令牌获取成功")
-                return self.access_token
-            else:
-                print(f"❌ 获取访问令牌失败: {data.get('errmsg', '未知错误')}")
-                return None
-                
-        except Exception as e:
-            print(f"❌ 获取访问令牌异常: {e}")
-            return None
+            if data.get('errcode') in INVALID_TOKEN_ERRCODES and attempt == 0:
+                print(f"⚠️ 访问令牌已失效（{data.get('errcode')}），重新获取后重试...")
+                self.token_manager.invalidate(access_token)
+                continue
+            return data
     
     def upload_media(self, file_path):
         """上传临时素材"""
-        access_token = self.get_access_token()
-        if not access_token:
-            return None
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
         
-        try:
-            url = f"https://qyapi.weixin.qq.com/cgi-bin/media/upload?access_token={access_token}&type=image"
-            
+        def send(url):
             with open(file_path, 'rb') as f:
-                files = {'media': (os.path.basename(file_path), f, 'image/jpeg')}
-                response = requests.post(url, files=files, timeout=30)
-                response.raise_for_status()
-                data = response.json()
+                files = {'media': (os.path.basename(file_path), f, content_type)}
+                return http_client.post(f"{url}&type=image", kind='upload', files=files)
+        
+        try:
+            data = self._call_api('media/upload', send)
+            if data is None:
+                return None
             
             if data.get('errcode') == 0:
                 media_id = data['media_id']
@@ -78,57 +81,81 @@ class WeComNotifier:
             print(f"❌ 图片上传异常: {e}")
             return None
     
-    def send_image_message(self, media_id, touser="@all", toparty="", totag=""):
-        """发送图片消息"""
-        access_token = self.get_access_token()
-        if not access_token:
-            return False
+    def media_id_for(self, file_path, refresh=False):
+        """获取图片的 media_id：相同内容的图片在有效期内已上传过时直接复用，否则上传"""
+        digest = file_digest(file_path)
+        with self._upload_locks[int(digest[:2], 16) % len(self._upload_locks)]:
+            if not refresh:
+                media_id = self.media_cache.get(self.app_key, digest)
+                if media_id:
+                    print(f"♻️ 复用已上传的图片，media_id: {media_id}")
+                    return media_id
+            
+            media_id = self.upload_media(file_path)
+            if media_id:
+                self.media_cache.put(self.app_key, digest, media_id)
+            return media_id
+    
+    def _send_image_message(self, media_id, touser, toparty, totag):
+        """发送图片消息，返回错误码（请求异常时为None）"""
+        data = {
+            "touser": touser,
+            "toparty": toparty,
+            "totag": totag,
+            "msgtype": "image",
+            "agentid": self.agentid,
+            "image": {
+                "media_id": media_id
+            },
+            "safe": 0,
+            "enable_duplicate_check": 0,
+            "duplicate_check_interval": 1800
+        }
         
         try:
-            url = f"https://qyapi.weixin.qq.com/cgi-bin/message/send?access_token={access_token}"
-            
-            data = {
-                "touser": touser,
-                "toparty": toparty,
-                "totag": totag,
-                "msgtype": "image",
-                "agentid": self.agentid,
-                "image": {
-                    "media_id": media_id
-                },
-                "safe": 0,
-                "enable_duplicate_check": 0,
-                "duplicate_check_interval": 1800
-            }
-            
-            response = requests.post(url, json=data, timeout=10)
-            response.raise_for_status()
-            result = response.json()
+            result = self._call_api('message/send', lambda url: http_client.post(url, kind='wecom', json=data))
+            if result is None:
+                return None
             
             if result.get('errcode') == 0:
                 print("✅ 企业微信消息发送成功")
-                return True
             else:
                 print(f"❌ 消息发送失败: {result.get('errmsg', '未知错误')}")
-                return False
+            return result.get('errcode')
                 
         except Exception as e:
             print(f"❌ 消息发送异常: {e}")
-            return False
+            return None
+    
+    def send_image_message(self, media_id, touser="@all", toparty="", totag=""):
+        """发送图片消息"""
+        return self._send_image_message(media_id, touser, toparty, totag) == 0
+    
+    def send_image(self, image_path, media_id, touser="@all", toparty="", totag=""):
+        """用已上传的 media_id 发送图片；企业微信拒绝该 media_id 时重新上传后再发送一次"""
+        errcode = self._send_image_message(media_id, touser, toparty, totag)
+        if errcode in INVALID_MEDIA_ERRCODES:
+            print(f"⚠️ media_id 已失效（{errcode}），重新上传...")
+            self.media_cache.invalidate(self.app_key, file_digest(image_path), media_id)
+            media_id = self.media_id_for(image_path, refresh=True)
+            if not media_id:
+                return False
+            errcode = self._send_image_message(media_id, touser, toparty, totag)
+        return errcode == 0
     
     def push_image(self, image_path, touser="@all", toparty="", totag=""):
         """推送图片（完整流程）"""
         print("📤 开始推送到企业微信...")
         
-        # 1. 上传图片
+        # 1. 上传图片（相同图片在有效期内已上传过时直接复用）
         print("📎 上传图片到企业微信...")
-        media_id = self.upload_media(image_path)
+        media_id = self.media_id_for(image_path)
         if not media_id:
             return False
         
         # 2. 发送消息
         print("📢 发送图片消息...")
-        success = self.send_image_message(media_id, touser, toparty, totag)
+        success = self.send_image(image_path, media_id, touser, toparty, totag)
         
         if success:
             print("🎉 推送完成！")
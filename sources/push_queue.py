@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+异步推送队列模块
+长图生成后放入有界队列，由独立的推送线程上传和发送，上传慢时不再阻塞渲染和RSS拉取；
+每个企业微信应用一个令牌桶，按应用的消息频率限制推送速度；同一接收者的消息按入队顺序依次发送
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶限速器（线程安全）"""
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0  # 每秒补充的令牌数
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，没有令牌时等待，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class PushQueue:
+    """有界推送队列 + 推送线程池
+
+    任务按接收者分组：同一接收者同一时间只有一个任务在发送，保证按入队顺序送达；
+    不同接收者的任务由多个线程并行发送
+    """
+
+    def __init__(self, workers=2, max_size=100, rate_per_minute=0, burst=1):
+        self.max_size = max(1, max_size)
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self._limiters = {}  # 限速分组（企业微信应用） -> 令牌桶
+        self._cond = threading.Condition()
+        self._pending = {}  # 接收者 -> 待发送任务队列
+        self._ready = deque()  # 有待发送任务且没有任务在发送中的接收者
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            'submitted': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'max_depth': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0,
+        }
+        self._threads = [
+            threading.Thread(target=self._worker, name=f'wecom-push-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, recipient, func, *args, bucket=None):
+        """提交推送任务；队列已满时阻塞，直到有空位
+
+        recipient 为接收者标识，func(*args) 执行推送并返回是否成功；
+        bucket 为限速分组，同一分组共用一个令牌桶
+        """
+        with self._cond:
+            if self._size >= self.max_size:
+                logger.warning(f"⚠️ 推送队列已满（{self._size}），等待推送线程处理...")
+                while self._size >= self.max_size and not self._closed:
+                    self._cond.wait()
+            if self._closed:
+                raise RuntimeError("推送队列已关闭")
+
+            queue = self._pending.get(recipient)
+            if queue is None:
+                queue = self._pending[recipient] = deque()
+                self._ready.append(recipient)
+            queue.append((time.monotonic(), bucket, func, args))
+            self._size += 1
+            self._stats['submitted'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._size)
+            self._cond.notify_all()
+
+    def _next_job(self):
+        """取出下一个可发送的任务；队列关闭且已清空时返回None"""
+        with self._cond:
+            while not self._ready:
+                if self._closed and self._size == 0:
+                    return None
+                self._cond.wait()
+            recipient = self._ready.popleft()
+            enqueued_at, bucket, func, args = self._pending[recipient].popleft()
+            return recipient, enqueued_at, bucket, func, args
+
+    def _limiter(self, bucket):
+        """限速分组对应的令牌桶，不限速时返回None"""
+        if self.rate_per_minute <= 0:
+            return None
+        with self._cond:
+            limiter = self._limiters.get(bucket)
+            if limiter is None:
+                limiter = self._limiters[bucket] = TokenBucket(self.rate_per_minute, self.burst)
+            return limiter
+
+    def _finish_job(self, recipient, waited, success):
+        with self._cond:
+            # 该接收者还有任务时重新排到就绪队列末尾，否则移除
+            if self._pending[recipient]:
+                self._ready.append(recipient)
+            else:
+                del self._pending[recipient]
+            self._size -= 1
+            self._stats['succeeded' if success else 'failed'] += 1
+            self._stats['total_wait'] += waited
+            self._stats['max_wait'] = max(self._stats['max_wait'], waited)
+            self._cond.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            recipient, enqueued_at, bucket, func, args = job
+            limiter = self._limiter(bucket)
+            if limiter:
+                limiter.acquire()
+            waited = time.monotonic() - enqueued_at  # 排队时间（含限速等待）
+            success = False
+            try:
+                success = bool(func(*args))
+            except Exception as e:
+                logger.error(f"❌ 推送任务异常: {e}")
+            finally:
+                self._finish_job(recipient, waited, success)
+
+    def depth(self):
+        """当前排队和发送中的任务数"""
+        with self._cond:
+            return self._size
+
+    def stats(self):
+        """队列统计：当前深度、最大深度、成功/失败数、平均和最长排队时间（秒）"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['depth'] = self._size
+        finished = stats['succeeded'] + stats['failed']
+        stats['avg_wait'] = stats.pop('total_wait') / finished if finished else 0.0
+        return stats
+
+    def shutdown(self, timeout=None):
+        """停止接收新任务，等待已入队的任务发送完成（最多 timeout 秒），返回未完成的任务数"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        return self.depth()
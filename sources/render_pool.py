@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+长图渲染进程池模块
+生成长图（缩放、合成、文字绘制、JPEG编码）是CPU密集型任务，
+多条新微博同时到达时分发到多个工作进程并行渲染，主进程继续拉取RSS
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from create import WeiboImageGenerator
+from media_cache import MediaCache
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的长图生成器（进程启动时创建一次，字体和字符宽度表只加载一次）
+_generator = None
+
+
+def _init_worker(generator_kwargs, media_cache_dir, media_cache_bytes):
+    """工作进程初始化"""
+    global _generator
+    media_cache = MediaCache(media_cache_dir, media_cache_bytes) if media_cache_dir else None
+    _generator = WeiboImageGenerator(media_cache=media_cache, **generator_kwargs)
+
+
+def _render(channel_info, weibo_item, profile):
+    """在工作进程中生成长图，返回各页输出文件路径"""
+    return _generator.generate_pages(channel_info, weibo_item, profile=profile)
+
+
+class RenderPool:
+    """长图渲染进程池"""
+
+    def __init__(self, workers, generator_kwargs=None, media_cache_dir=None, media_cache_bytes=0):
+        self.workers = workers
+        self._initargs = (generator_kwargs or {}, media_cache_dir, media_cache_bytes)
+        self._executor = self._create_executor()
+
+    def _create_executor(self):
+        # 使用 spawn 启动工作进程，避免 fork 时继承主进程中其他线程持有的锁
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=self._initargs
+        )
+
+    def submit(self, channel_info, weibo_item, profile=None):
+        """提交渲染任务，返回结果为各页输出文件路径列表的 Future"""
+        try:
+            return self._executor.submit(_render, channel_info, weibo_item, profile)
+        except BrokenProcessPool:
+            # 工作进程异常退出后进程池不可再用，重建后重新提交
+            logger.warning("⚠️ 渲染进程池已损坏，正在重建...")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            return self._executor.submit(_render, channel_info, weibo_item, profile)
+
+    def shutdown(self):
+        """关闭进程池"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+推送路由模块
+按RSS源或频道UID把长图推送给不同的接收者，或推送到不同的企业微信应用；
+没有匹配的路由时推送给 WECOM_TOUSER / WECOM_TOPARTY / WECOM_TOTAG 配置的默认接收者
+"""
+
+import os
+import json
+from typing import NamedTuple
+
+DEFAULT_APP = 'default'  # 环境变量 WECOM_CORPID / WECOM_CORPSECRET / WECOM_AGENTID 配置的应用
+MATCH_ALL = '*'
+
+
+class Target(NamedTuple):
+    """推送目标：企业微信应用 + 接收者"""
+    app: str
+    touser: str = ''
+    toparty: str = ''
+    totag: str = ''
+
+    @property
+    def key(self):
+        return f"{self.app}|{self.touser}|{self.toparty}|{self.totag}"
+
+    def describe(self):
+        recipients = [f"{label}={value}" for label, value in
+                      (('用户', self.touser), ('部门', self.toparty), ('标签', self.totag)) if value]
+        return f"{self.app}（{'，'.join(recipients)}）"
+
+
+class RoutingTable:
+    """路由表"""
+
+    def __init__(self, apps, routes=(), default_targets=()):
+        self.apps = apps  # 应用名 -> {'corpid', 'corpsecret', 'agentid'}
+        self.routes = list(routes)  # [(匹配键集合, [Target])]
+        self.default_targets = list(default_targets)
+
+    def targets_for(self, keys):
+        """所有匹配路由的推送目标（去重，保持配置顺序）；没有匹配时返回默认目标"""
+        keys = set(keys)
+        targets = {}
+        for match, route_targets in self.routes:
+            if MATCH_ALL in match or match & keys:
+                for target in route_targets:
+                    targets.setdefault(target.key, target)
+        return list(targets.values()) if targets else list(self.default_targets)
+
+
+def load_routing(path, default_app=None, default_target=None):
+    """加载路由表，配置有误时抛出 ValueError
+
+    default_app 为环境变量配置的应用（未配置时为None），default_target 为默认接收者 (touser, toparty, totag)
+    """
+    apps = {DEFAULT_APP: default_app} if default_app else {}
+    default_targets = [Target(DEFAULT_APP, *default_target)] if default_app and default_target else []
+    if not path or not os.path.exists(path):
+        return RoutingTable(apps, default_targets=default_targets)
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        raise ValueError(f"读取路由配置失败 {path}: {e}")
+
+    for name, app in (data.get('apps') or {}).items():
+        missing = [field for field in ('corpid', 'corpsecret', 'agentid') if not app.get(field)]
+        if missing:
+            raise ValueError(f"企业微信应用 {name} 缺少配置: {', '.join(missing)}")
+        apps[name] = {'corpid': app['corpid'], 'corpsecret': app['corpsecret'], 'agentid': int(app['agentid'])}
+
+    routes = []
+    for index, route in enumerate(data.get('routes') or [], 1):
+        match = route.get('match')
+        match = {match} if isinstance(match, str) else set(match or ())
+        if not match:
+            raise ValueError(f"第 {index} 条路由缺少 match")
+        targets = []
+        for target in route.get('targets') or []:
+            target = Target(
+                str(target.get('app', DEFAULT_APP)),
+                target.get('touser', ''),
+                target.get('toparty', ''),
+                target.get('totag', '')
+            )
+            if target.app not in apps:
+                raise ValueError(f"第 {index} 条路由引用了未配置的企业微信应用: {target.app}")
+            if not (target.touser or target.toparty or target.totag):
+                raise ValueError(f"第 {index} 条路由的推送目标缺少 touser / toparty / totag")
+            targets.append(target)
+        if not targets:
+            raise ValueError(f"第 {index} 条路由缺少 targets")
+        routes.append((match, targets))
+
+    return RoutingTable(apps, routes, default_targets)
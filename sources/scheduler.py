@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+自适应RSS轮询调度模块
+根据每个RSS源观察到的发布时间估算发帖频率，活跃账号更频繁地拉取，沉寂账号降低频率
+"""
+
+import os
+import json
+import math
+import heapq
+import random
+import threading
+import time
+import logging
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+MAX_POST_TIMES = 20  # 每个RSS源保留的最近发布时间数量
+DEFAULT_RATE = 1 / (30 * 86400)  # 没有发布记录时假定每30天发一条
+
+
+def parse_pub_date(pub_date):
+    """解析RSS发布时间为时间戳，失败返回None"""
+    if not pub_date:
+        return None
+    try:
+        return parsedate_to_datetime(pub_date).timestamp()
+    except Exception:
+        return None
+
+
+class FeedScheduler:
+    """基于优先队列的RSS轮询调度器
+
+    在与固定间隔相同的请求预算（RSS源数量 / base_interval）下，
+    按发帖频率的平方根分配轮询次数，使整体检测延迟最小
+    """
+
+    def __init__(self, rss_urls, data_dir, base_interval, min_interval=60, max_interval=3600, jitter=0.1):
+        self.file_path = os.path.join(data_dir, 'scheduler_state.json')
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, max_interval)
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self._lock = threading.Lock()
+        self._heap = []  # (下次拉取时间, RSS地址)
+        self._feeds = {}
+
+        saved = self._load()
+        now = time.time()
+        for rss_url in rss_urls:
+            state = saved.get(rss_url, {})
+            self._feeds[rss_url] = {
+                'post_times': sorted(state.get('post_times', []))[-MAX_POST_TIMES:],
+                'interval': state.get('interval', base_interval),
+                'next_poll': min(state.get('next_poll', now), now + self.max_interval),
+            }
+            heapq.heappush(self._heap, (self._feeds[rss_url]['next_poll'], rss_url))
+
+    def _load(self):
+        """加载调度状态"""
+        try:
+            if os.path.exists(self.file_path):
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                return data.get('feeds', {}) if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.error(f"⚠️ 加载调度状态失败: {e}")
+        return {}
+
+    def save(self):
+        """保存调度状态"""
+        with self._lock:
+            data = {
+                'feeds': {url: dict(state) for url, state in self._feeds.items()},
+                'last_update': datetime.now().isoformat()
+            }
+
+        try:
+            tmp_path = self.file_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            logger.error(f"⚠️ 保存调度状态失败: {e}")
+
+    def _estimate_rate(self, post_times, now):
+        """估算发帖频率（条/秒），包含最后一条之后的沉寂时间"""
+        if not post_times:
+            return DEFAULT_RATE
+        span = max(now - post_times[0], self.min_interval)
+        return max(len(post_times) / span, DEFAULT_RATE)
+
+    def _interval_for(self, rss_url, now):
+        """按平方根分配计算某个RSS源的轮询间隔"""
+        weights = {url: math.sqrt(self._estimate_rate(state['post_times'], now))
+                   for url, state in self._feeds.items()}
+        # 总请求速率保持为 len(feeds) / base_interval
+        scale = self.base_interval * sum(weights.values()) / len(weights)
+        interval = scale / weights[rss_url]
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def record_posts(self, rss_url, pub_dates):
+        """记录一次拉取中观察到的发布时间"""
+        timestamps = [ts for ts in (parse_pub_date(d) for d in pub_dates) if ts is not None]
+        if not timestamps:
+            return
+        with self._lock:
+            state = self._feeds.get(rss_url)
+            if state is None:
+                return
+            merged = set(state['post_times']) | set(timestamps)
+            state['post_times'] = sorted(merged)[-MAX_POST_TIMES:]
+
+    def complete(self, rss_url):
+        """一次拉取结束，重新计算间隔并放回队列"""
+        now = time.time()
+        with self._lock:
+            state = self._feeds.get(rss_url)
+            if state is None:
+                return
+            interval = self._interval_for(rss_url, now)
+            delay = interval * (1 + random.uniform(-self.jitter, self.jitter))
+            state['interval'] = round(interval, 1)
+            state['next_poll'] = now + delay
+            heapq.heappush(self._heap, (state['next_poll'], rss_url))
+        logger.debug(f"📅 {rss_url} 下次拉取间隔 {delay:.0f} 秒")
+
+    def pop_due(self):
+        """取出所有已到期的RSS源"""
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, rss_url = heapq.heappop(self._heap)
+                due.append(rss_url)
+        return due
+
+    def seconds_until_next(self):
+        """距离下一个RSS源到期的秒数"""
+        with self._lock:
+            if not self._heap:
+                return self.base_interval
+            return max(0.0, self._heap[0][0] - time.time())
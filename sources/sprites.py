@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+图标和蒙版预渲染模块
+播放按钮、圆形头像蒙版和头像阴影按尺寸只绘制一次，之后各次渲染直接复用
+
+返回的图片为共享对象，调用方只能读取（用作合成源或蒙版），不能修改
+"""
+
+from functools import lru_cache
+
+from PIL import Image, ImageDraw
+
+
+@lru_cache(maxsize=32)
+def play_icon(icon_size):
+    """视频播放图标：半透明黑色圆形背景 + 白色三角形（RGBA）
+
+    边长为 icon_size // 2 * 2 + 1，左上角对应图标区域左上角
+    """
+    circle_radius = icon_size // 2
+    side = circle_radius * 2 + 1
+    sprite = Image.new('RGBA', (side, side), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+
+    # 半透明圆形背景
+    draw.ellipse([0, 0, circle_radius * 2, circle_radius * 2], fill=(0, 0, 0, 128))
+
+    # 三角形播放图标
+    triangle_size = icon_size // 3
+    triangle_x = circle_radius - triangle_size // 3
+    triangle_y = circle_radius
+    triangle_points = [
+        (triangle_x, triangle_y - triangle_size // 2),
+        (triangle_x, triangle_y + triangle_size // 2),
+        (triangle_x + triangle_size, triangle_y)
+    ]
+    draw.polygon(triangle_points, fill=(255, 255, 255, 255))
+    return sprite
+
+
+@lru_cache(maxsize=16)
+def circle_mask(size):
+    """圆形头像蒙版（L）"""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size[0], size[1]), fill=255)
+    return mask
+
+
+def shadow_offset(size):
+    """头像阴影的偏移量：3x档位的192px头像为2px，按头像边长等比缩放，至少1px"""
+    return max(1, round(size[0] / 96))
+
+
+@lru_cache(maxsize=16)
+def avatar_shadow(size):
+    """圆形头像的微妙阴影（RGBA），四周各留 shadow_offset 像素"""
+    offset = shadow_offset(size)
+    shadow = Image.new("RGBA", (size[0] + offset * 2, size[1] + offset * 2), (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).ellipse([offset, offset, size[0] + offset, size[1] + offset], fill=(0, 0, 0, 30))
+    return shadow
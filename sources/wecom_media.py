@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+企业微信临时素材缓存模块
+按文件内容哈希记录上传得到的 media_id（临时素材有效期3天），
+重试推送或同一张图发给多组接收者时不再重复上传
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FILE = 'wecom_media.json'
+MEDIA_TTL = 3 * 86400 - 600  # 临时素材有效期3天，提前10分钟视为过期
+
+# media_id 无效（40007）：作废缓存后重新上传
+INVALID_MEDIA_ERRCODES = {40007}
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_dir = None
+
+
+def configure(data_dir):
+    """设置缓存保存目录（未设置时只缓存在内存中）"""
+    global _cache_dir, _cache
+    with _cache_lock:
+        _cache_dir = data_dir
+        _cache = None
+
+
+def get_media_cache():
+    """获取进程内共享的素材缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MediaIdCache(_cache_dir)
+        return _cache
+
+
+def file_digest(file_path):
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaIdCache:
+    """media_id 缓存（线程安全），键为 企业应用 + 文件内容哈希"""
+
+    def __init__(self, cache_dir=None):
+        self.file_path = os.path.join(cache_dir, MEDIA_FILE) if cache_dir else None
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        if not self.file_path or not os.path.exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.warning(f"⚠️ 读取企业微信素材缓存失败: {e}")
+            return {}
+
+    def _save(self):
+        """保存缓存（调用方持有锁），同时丢弃已过期的条目"""
+        now = time.time()
+        self._entries = {key: entry for key, entry in self._entries.items() if entry.get('expires_at', 0) > now}
+        if not self.file_path:
+            return
+        try:
+            tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存企业微信素材缓存失败: {e}")
+
+    def get(self, app_key, digest):
+        """有效期内的 media_id，没有时返回None"""
+        with self._lock:
+            entry = self._entries.get(f"{app_key}:{digest}")
+        if entry and time.time() < entry.get('expires_at', 0):
+            return entry['media_id']
+        return None
+
+    def put(self, app_key, digest, media_id):
+        with self._lock:
+            self._entries[f"{app_key}:{digest}"] = {'media_id': media_id, 'expires_at': time.time() + MEDIA_TTL}
+            self._save()
+
+    def invalidate(self, app_key, digest, media_id):
+        """企业微信拒绝 media_id 时作废缓存（已被其他线程重新上传的不受影响）"""
+        with self._lock:
+            key = f"{app_key}:{digest}"
+            if self._entries.get(key, {}).get('media_id') == media_id:
+                del self._entries[key]
+                self._save()
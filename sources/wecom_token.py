@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+企业微信访问令牌管理模块
+同一企业应用（corpid + secret）在进程内共用一个令牌，保存到数据目录，重启后继续使用；
+临近过期时提前刷新，接口返回令牌失效错误时作废并重新获取
+
+刷新是惰性的，在推送线程调用 get() 时进行，不另设后台定时刷新：企业微信在有效期内重复调用
+gettoken 返回同一个令牌，提前刷新拿不到新令牌，每个令牌约两小时才在推送时多一次 gettoken 请求
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+
+import http_client
+
+logger = logging.getLogger(__name__)
+
+GETTOKEN_URL = "https://qyapi.weixin.qq.com/cgi-bin/gettoken"
+TOKEN_FILE = 'wecom_tokens.json'
+REFRESH_MARGIN = 300  # 距离过期不足此秒数时提前刷新
+
+# 令牌无效（40014）、令牌已过期（42001）、缺少令牌（41001）：作废令牌后重试一次
+INVALID_TOKEN_ERRCODES = {40014, 42001, 41001}
+
+_managers = {}
+_managers_lock = threading.Lock()
+_cache_dir = None
+
+
+def configure(data_dir):
+    """设置令牌保存目录（未设置时只缓存在内存中）"""
+    global _cache_dir
+    _cache_dir = data_dir
+
+
+def get_token_manager(corpid, corpsecret):
+    """获取企业应用对应的令牌管理器（进程内共享）"""
+    key = (corpid, corpsecret)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = AccessTokenManager(corpid, corpsecret, _cache_dir)
+            _managers[key] = manager
+        return manager
+
+
+class AccessTokenManager:
+    """单个企业应用的访问令牌（线程安全）"""
+
+    def __init__(self, corpid, corpsecret, cache_dir=None):
+        self.corpid = corpid
+        self.corpsecret = corpsecret
+        # 文件中不保存secret原文，以 corpid + secret摘要 作为键
+        self.key = f"{corpid}:{hashlib.sha256(corpsecret.encode('utf-8')).hexdigest()[:16]}"
+        self.file_path = os.path.join(cache_dir, TOKEN_FILE) if cache_dir else None
+        self._lock = threading.Lock()
+        self.access_token = None
+        self.expires_at = 0
+        self.refresh_at = 0  # 到达此时间后 get() 重新获取令牌
+        self._load()
+
+    def _load(self):
+        """读取已保存的令牌"""
+        entry = self._read_file().get(self.key)
+        if isinstance(entry, dict) and entry.get('access_token'):
+            self.access_token = entry['access_token']
+            self.expires_at = entry.get('expires_at', 0)
+            self.refresh_at = self.expires_at - REFRESH_MARGIN
+
+    def _read_file(self):
+        if not self.file_path or not os.path.exists(self.file_path):
+            return {}
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except Exception as e:
+            logger.warning(f"⚠️ 读取企业微信令牌缓存失败: {e}")
+            return {}
+
+    def _save(self):
+        """保存令牌（调用方持有锁），保留其他企业应用的令牌"""
+        if not self.file_path:
+            return
+        data = self._read_file()
+        if self.access_token:
+            data[self.key] = {'access_token': self.access_token, 'expires_at': self.expires_at}
+        else:
+            data.pop(self.key, None)
+        try:
+            tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            logger.warning(f"⚠️ 保存企业微信令牌缓存失败: {e}")
+
+    def _fetch(self):
+        """调用 gettoken 获取新令牌，失败返回None"""
+        try:
+            response = http_client.get(GETTOKEN_URL, kind='wecom',
+                                       params={'corpid': self.corpid, 'corpsecret': self.corpsecret})
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            print(f"❌ 获取访问令牌异常: {e}")
+            return None
+
+        if data.get('errcode') != 0:
+            print(f"❌ 获取访问令牌失败: {data.get('errmsg', '未知错误')}")
+            return None
+        now = time.time()
+        self.access_token = data['access_token']
+        self.expires_at = now + data['expires_in']
+        self.refresh_at = self.expires_at - REFRESH_MARGIN
+        if self.refresh_at <= now:
+            # 有效期内重复获取返回的是同一个令牌，剩余时间已不足时用到过期为止，避免每次调用都请求 gettoken
+            self.refresh_at = self.expires_at
+        self._save()
+        print("✅ 企业微信访问令牌获取成功")
+        return self.access_token
+
+    def get(self):
+        """获取访问令牌；临近过期时提前刷新，刷新失败但旧令牌仍有效时继续使用旧令牌"""
+        with self._lock:
+            now = time.time()
+            if self.access_token and now < self.refresh_at:
+                return self.access_token
+            token = self._fetch()
+            if token is None and self.access_token and now < self.expires_at - 60:
+                return self.access_token
+            return token
+
+    def invalidate(self, token):
+        """接口返回令牌失效时作废令牌（已被其他线程刷新过的新令牌不受影响）"""
+        with self._lock:
+            if self.access_token == token:
+                self.access_token = None
+                self.expires_at = 0
+                self.refresh_at = 0
+                self._save()
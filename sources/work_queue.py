@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+持久化工作队列模块
+记录每条新微博的处理阶段（detected → rendered → uploaded → sent），保存在数据目录下的SQLite数据库；
+进程重启或渲染/推送失败后从最后完成的阶段继续，推送失败重试时不再重新下载和渲染
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 处理阶段
+DETECTED = 'detected'  # 已发现，等待渲染
+RENDERED = 'rendered'  # 长图已生成，等待上传
+UPLOADED = 'uploaded'  # 所有页已上传，等待发送
+SENT = 'sent'          # 所有页已发送（未配置企业微信时渲染完成即结束）
+FAILED = 'failed'      # 重试次数用尽
+
+RETRY_DELAY = 60  # 首次重试等待秒数，之后每次翻倍
+RETENTION_DAYS = 7  # 已结束的任务保留天数
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    item_id TEXT PRIMARY KEY,
+    rss_url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    pages TEXT NOT NULL DEFAULT '[]',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_stage ON jobs (stage, next_attempt);
+"""
+
+
+class WorkQueue:
+    """新微博处理任务队列（线程安全，每次状态变化立即写入磁盘）"""
+
+    def __init__(self, data_dir, max_retries=3):
+        self.db_path = os.path.join(data_dir, 'work_queue.db')
+        self.max_retries = max(0, max_retries)  # 首次失败后最多重试的次数
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, item):
+        """记录新发现的微博，已存在时返回False"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO jobs (item_id, rss_url, payload, stage, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (item['item_id'], item['rss_url'], json.dumps(item, ensure_ascii=False), DETECTED, now, now)
+            )
+            return cursor.rowcount == 1
+
+    def due(self, exclude=()):
+        """未完成且已到重试时间的任务，按发现顺序返回 [(微博条目, 阶段)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT item_id, payload, stage FROM jobs WHERE stage NOT IN (?, ?) AND next_attempt <= ? '
+                'ORDER BY created_at',
+                (SENT, FAILED, time.time())
+            ).fetchall()
+        return [(json.loads(payload), stage) for item_id, payload, stage in rows if item_id not in exclude]
+
+    def pages(self, item_id):
+        """各页的推送状态 [{'file', 'media_ids': {应用: media_id}, 'sent_to': [推送目标], 'sent'}]"""
+        with self._lock:
+            return self._pages(item_id)
+
+    def _pages(self, item_id):
+        row = self._conn.execute('SELECT pages FROM jobs WHERE item_id = ?', (item_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def _update(self, item_id, **fields):
+        """更新任务字段（调用方持有锁）"""
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self._conn:
+            self._conn.execute(f'UPDATE jobs SET {assignments} WHERE item_id = ?', (*fields.values(), item_id))
+
+    def mark_rendered(self, item_id, files):
+        """长图已生成"""
+        pages = [{'file': path, 'media_ids': {}, 'sent_to': [], 'sent': False} for path in files]
+        with self._lock:
+            self._update(item_id, stage=RENDERED, pages=json.dumps(pages, ensure_ascii=False))
+
+    def mark_uploaded(self, item_id, index, app, media_id, apps):
+        """某页已上传到企业微信应用 app；所有页都已上传到 apps 中的每个应用时进入 uploaded 阶段"""
+        with self._lock:
+            pages = self._pages(item_id)
+            pages[index].setdefault('media_ids', {})[app] = media_id
+            fields = {'pages': json.dumps(pages, ensure_ascii=False)}
+            if all(set(apps) <= set(page.get('media_ids', {})) for page in pages):
+                fields['stage'] = UPLOADED
+            self._update(item_id, **fields)
+
+    def mark_sent(self, item_id, index, target, targets):
+        """某页已发送给推送目标 target；返回 (该页是否已发给 targets 中的所有目标, 任务是否结束)"""
+        with self._lock:
+            pages = self._pages(item_id)
+            page = pages[index]
+            sent_to = page.setdefault('sent_to', [])
+            if target not in sent_to:
+                sent_to.append(target)
+            page['sent'] = set(targets) <= set(sent_to)
+            fields = {'pages': json.dumps(pages, ensure_ascii=False)}
+            finished = all(page['sent'] for page in pages)
+            if finished:
+                fields['stage'] = SENT
+            self._update(item_id, **fields)
+            return page['sent'], finished
+
+    def complete(self, item_id):
+        """无需推送，任务直接结束"""
+        with self._lock:
+            self._update(item_id, stage=SENT)
+
+    def restart(self, item_id):
+        """长图文件已丢失，回到 detected 阶段重新渲染（不计入失败次数）"""
+        with self._lock:
+            self._update(item_id, stage=DETECTED, pages='[]')
+
+    def mark_failed(self, item_id, error):
+        """记录失败：未达到重试上限时按指数退避安排重试，保留已完成的阶段；返回是否还会重试"""
+        with self._lock:
+            row = self._conn.execute('SELECT attempts FROM jobs WHERE item_id = ?', (item_id,)).fetchone()
+            if row is None:
+                return False
+            attempts = row[0] + 1
+            if attempts > self.max_retries:
+                self._update(item_id, stage=FAILED, attempts=attempts, last_error=str(error))
+                return False
+            self._update(item_id, attempts=attempts, last_error=str(error),
+                         next_attempt=time.time() + RETRY_DELAY * 2 ** (attempts - 1))
+            return True
+
+    def counts(self):
+        """各阶段的任务数"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT stage, COUNT(*) FROM jobs GROUP BY stage').fetchall())
+
+    def prune(self, days=RETENTION_DAYS):
+        """删除已结束超过指定天数的任务，返回删除数量"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM jobs WHERE stage IN (?, ?) AND updated_at < ?',
+                (SENT, FAILED, time.time() - days * 86400)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""测试配置：源码为 sources/ 下的平铺模块，加入导入路径"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sources'))
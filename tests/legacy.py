@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+优化前的旧实现，作为输出一致性测试和基准测试（sources/benchmark.py）的对照
+"""
+
+import re
+from html import unescape
+
+from PIL import Image, ImageDraw
+
+
+def legacy_clean_html(html_content):
+    """优化前的 clean_html（多次正则替换），作为对照"""
+    if not html_content:
+        return ''
+
+    html_content = re.sub(r'<br\s*/?>', '\n', html_content, flags=re.IGNORECASE)
+    html_content = re.sub(r'<br>', '\n', html_content, flags=re.IGNORECASE)
+    html_content = re.sub(r'<video.*?</video>', '', html_content, flags=re.DOTALL)
+    html_content = re.sub(r'<img[^>]*>', '', html_content)
+    html_content = re.sub(r'<a[^>]*>(.*?)</a>', r'\1', html_content)
+    html_content = re.sub(r'<[^>]+>', '', html_content)
+    html_content = re.sub(r'</p>\s*<p[^>]*>', '\n\n', html_content, flags=re.IGNORECASE)
+    html_content = re.sub(r'</?p[^>]*>', '\n', html_content, flags=re.IGNORECASE)
+    html_content = re.sub(r'</div>\s*<div[^>]*>', '\n', html_content, flags=re.IGNORECASE)
+    html_content = re.sub(r'</?div[^>]*>', '\n', html_content, flags=re.IGNORECASE)
+    html_content = unescape(html_content)
+    html_content = re.sub(r'\n\s*\n\s*\n+', '\n\n', html_content)
+    html_content = re.sub(r'^\s+|\s+$', '', html_content)
+    return html_content
+
+
+def legacy_extract_image_urls(html_content):
+    """优化前的 extract_image_urls（每张图片重新编译正则并回扫全文），作为对照"""
+    if not html_content:
+        return []
+
+    matches = re.findall(r'<img[^>]*src="([^"]*)"[^>]*>', html_content)
+    valid_urls = []
+    for url in matches:
+        skip_keywords = ['icon', 'emoji', 'timeline_card', 'small_video_default', '1rem', 'avatar']
+        should_skip = any(keyword in url.lower() for keyword in skip_keywords)
+        img_match = re.search(rf'<img[^>]*src="{re.escape(url)}"[^>]*>', html_content)
+        if img_match:
+            img_tag = img_match.group(0)
+            if 'width: 1rem' in img_tag or 'height: 1rem' in img_tag:
+                should_skip = True
+        if not should_skip and url.startswith('http'):
+            valid_urls.append(url)
+    return valid_urls
+
+
+def legacy_extract_video_info(html_content):
+    """优化前的 extract_video_info，作为对照"""
+    if not html_content:
+        return None
+
+    video_info = {}
+    poster_match = re.search(r'poster="([^"]*)"', html_content)
+    if poster_match:
+        video_info['poster'] = poster_match.group(1)
+    video_match = re.search(r'<source src="([^"]*)"[^>]*>', html_content)
+    if video_match:
+        video_info['video_url'] = video_match.group(1)
+    return video_info if video_info else None
+
+
+def legacy_extract_media(html_content):
+    """优化前分两次提取图片和视频"""
+    return legacy_extract_image_urls(html_content), legacy_extract_video_info(html_content)
+
+
+def legacy_wrap_text(generator, text, font, max_width):
+    """优化前的 wrap_text（每个字符都用 textbbox 测量整行），作为对照"""
+    if not text:
+        return ''
+
+    lines = []
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1), "white"))
+    for paragraph in text.split('\n'):
+        if not paragraph.strip():
+            lines.append('')
+            continue
+
+        current_line = ''
+        i = 0
+        while i < len(paragraph):
+            char = paragraph[i]
+            test_line = current_line + char
+            bbox = draw.textbbox((0, 0), test_line, font=font)
+            if bbox[2] - bbox[0] <= max_width:
+                current_line = test_line
+                i += 1
+            else:
+                if not current_line:
+                    current_line = char
+                    i += 1
+                break_pos = generator.find_break_position(current_line)
+                if break_pos > 0 and break_pos < len(current_line):
+                    lines.append(current_line[:break_pos])
+                    current_line = current_line[break_pos:]
+                else:
+                    lines.append(current_line)
+                    current_line = ''
+
+        if current_line:
+            lines.append(current_line)
+
+    return '\n'.join(lines)
+
+
+def legacy_crop_to_square(img, size):
+    """优化前的 crop_to_square（小图先放大到1.5倍，再缩放、裁剪），作为对照"""
+    original_width, original_height = img.size
+    target_size = size[0]
+    min_dimension = min(original_width, original_height)
+    if min_dimension < target_size:
+        scale_factor = (target_size * 1.5) / min_dimension
+        new_width = int(original_width * scale_factor)
+        new_height = int(original_height * scale_factor)
+        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        original_width, original_height = new_width, new_height
+
+    if original_width > original_height:
+        new_width = int(original_width * target_size / original_height)
+        img_scaled = img.resize((new_width, target_size), Image.Resampling.LANCZOS)
+        left = (new_width - target_size) // 2
+        return img_scaled.crop((left, 0, left + target_size, target_size))
+    new_height = int(original_height * target_size / original_width)
+    img_scaled = img.resize((target_size, new_height), Image.Resampling.LANCZOS)
+    top = (new_height - target_size) // 2
+    return img_scaled.crop((0, top, target_size, top + target_size))
+
+
+def legacy_poster(img, max_width):
+    """优化前的纯视频封面处理（先放大，再按比例缩放），作为对照"""
+    if img.size[0] < max_width * 0.8:
+        scale_factor = max_width / img.size[0]
+        img = img.resize((int(img.size[0] * scale_factor), int(img.size[1] * scale_factor)),
+                         Image.Resampling.LANCZOS)
+    ratio = min(max_width / img.size[0], max_width / img.size[1])
+    return img.resize((int(img.size[0] * ratio), int(img.size[1] * ratio)), Image.Resampling.LANCZOS)
+
+
+def legacy_play_icon(img):
+    """优化前的 add_video_play_icon（整帧RGBA图层合成），作为对照"""
+    width, height = img.size
+    icon_size = min(width, height) // 4
+    icon_x = (width - icon_size) // 2
+    icon_y = (height - icon_size) // 2
+    overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    circle_radius = icon_size // 2
+    circle_center = (icon_x + circle_radius, icon_y + circle_radius)
+    draw.ellipse([
+        circle_center[0] - circle_radius, circle_center[1] - circle_radius,
+        circle_center[0] + circle_radius, circle_center[1] + circle_radius
+    ], fill=(0, 0, 0, 128))
+    triangle_size = icon_size // 3
+    triangle_x = circle_center[0] - triangle_size // 3
+    triangle_y = circle_center[1]
+    draw.polygon([
+        (triangle_x, triangle_y - triangle_size // 2),
+        (triangle_x, triangle_y + triangle_size // 2),
+        (triangle_x + triangle_size, triangle_y)
+    ], fill=(255, 255, 255, 255))
+    return Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
+
+
+def legacy_circle_avatar(avatar_img, size):
+    """优化前的 create_circle_avatar（每次重新绘制蒙版和阴影），作为对照"""
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size[0], size[1]), fill=255)
+    avatar_resized = avatar_img.resize(size, Image.Resampling.LANCZOS) if avatar_img.size != size else avatar_img
+    shadow_size = (size[0] + 4, size[1] + 4)
+    shadow = Image.new("RGBA", shadow_size, (0, 0, 0, 0))
+    ImageDraw.Draw(shadow).ellipse([2, 2, size[0] + 2, size[1] + 2], fill=(0, 0, 0, 30))
+    result = Image.new("RGBA", shadow_size, (0, 0, 0, 0))
+    avatar_bg = Image.new("RGBA", size, (255, 255, 255, 255))
+    avatar_bg.paste(avatar_resized, (0, 0))
+    avatar_bg.putalpha(mask)
+    result = Image.alpha_composite(result, shadow)
+    result.paste(avatar_bg, (0, 0), avatar_bg)
+    return result
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+测试和基准测试（sources/benchmark.py）共用的样本生成函数
+"""
+
+import random
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+
+def sample_text(chars=2000, seed=0):
+    """生成中英文混排的长微博正文"""
+    rng = random.Random(seed)
+    words = ['今天天气很好', '我们一起去公园散步吧', '看到了很多花', '拍了一些照片分享给大家',
+             'Weibo', 'RSSHub', 'https://m.weibo.cn/status/4987654321', '#话题#', '@用户名',
+             '，', '。', '！', '？', '、', ' ', '“引用”', '2024-01-01', 'WAVE AVATAR', '\n']
+    parts = []
+    length = 0
+    while length < chars:
+        word = rng.choice(words)
+        parts.append(word)
+        length += len(word)
+    return ''.join(parts)
+
+
+def sample_description(paragraphs=40, images=9, seed=0):
+    """生成接近RSSHub输出的长微博description"""
+    rng = random.Random(seed)
+    text = '今天天气很好，我们一起去公园散步吧！看到了很多花，拍了一些照片分享给大家。'
+    parts = []
+    for i in range(paragraphs):
+        parts.append(text[:rng.randint(10, len(text))])
+        parts.append(f' <a href="https://m.weibo.cn/search?containerid=231522type%3D1%26q%3D%23话题{i}%23">#话题{i}#</a> ')
+        parts.append('<span class="url-icon"><img alt="[doge]" '
+                     'src="https://face.t.sinajs.cn/t4/appstyle/expression/ext/normal/a1/2018new_doge02_org.png" '
+                     'style="width:1rem; height:1rem;" /></span>')
+        parts.append('&quot;引用&quot; &amp; 更多内容')
+        parts.append('<br><br>' if i % 3 == 0 else '<br />')
+    parts.append('<div style="clear: both"></div>')
+    parts.append('<video controls="controls" poster="https://wx1.sinaimg.cn/orj480/006abcdely1h0poster.jpg" '
+                 'style="width: 100%"><source src="https://f.video.weibocdn.com/o0/abcdef.mp4"></video>')
+    for i in range(images):
+        parts.append(f'<img style="" src="https://wx{i % 4 + 1}.sinaimg.cn/large/006abcdely1h{i:04d}.jpg" >')
+    return ''.join(parts)
+
+
+def fuzz_descriptions(count, seed=0):
+    """生成随机拼接的HTML片段，用于校验输出一致"""
+    rng = random.Random(seed)
+    tokens = [
+        '<br>', '<BR/>', '<br />', '<br clear="both">', '<video controls>', '</video>',
+        '<img src="https://wx1.sinaimg.cn/large/a.jpg">', '<a href="https://weibo.com">', '</a>',
+        '<p>', '</p>', '<div class="x">', '</div>', '<span>', '</span>', '<>',
+        '文字', 'text', ' ', '\n', '\t', '　', '&amp;', '&lt;br&gt;', '&nbsp;', '，',
+        # 不成对的尖括号（如正文中的“a<b”），旧实现先替换<br>、移除<video>，再移除其余标签
+        '<', '>', '<<', 'a<b', '<br', 'video>', '<video',
+    ]
+    return [''.join(rng.choice(tokens) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+def sample_photo(size=(2000, 1500), seed=0):
+    """生成带噪点的渐变照片（JPEG字节），模拟微博原图"""
+    rng = random.Random(seed)
+    gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+    noise = Image.effect_noise(size, 40).convert('RGB')
+    photo = Image.blend(gradient, noise, 0.3)
+    ImageDraw.Draw(photo).ellipse((size[0] // 4, size[1] // 4, size[0] // 2, size[1] // 2),
+                                  fill=(rng.randint(0, 255), 120, 200))
+    buffer = BytesIO()
+    photo.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def sample_post(chars=600, images=9):
+    """生成带配图的微博条目和频道信息"""
+    channel_info = {'title': '基准测试', 'link': 'https://weibo.com/u/1234567890', 'image_url': 'https://tvax1.sinaimg.cn/avatar.jpg'}
+    weibo_item = {
+        'content': sample_text(chars),
+        'author': '基准测试',
+        'pub_date': 'Mon, 01 Jan 2024 12:00:00 GMT',
+        'link': 'https://weibo.com/1234567890/Abcdefg',
+        'image_urls': [f'https://wx1.sinaimg.cn/large/bench{i}.jpg' for i in range(images)],
+    }
+    return channel_info, weibo_item
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""clean_html 单遍扫描与旧实现的输出一致性测试"""
+
+from create import RSSWeiboParser
+from legacy import legacy_clean_html
+from samples import fuzz_descriptions, sample_description
+
+
+def test_clean_html_matches_legacy():
+    corpus = fuzz_descriptions(2000) + [sample_description(n, seed=n) for n in (1, 10, 40, 200)]
+    for html in corpus:
+        assert RSSWeiboParser.clean_html(html) == legacy_clean_html(html), html
+
+
+def test_clean_html_stray_angle_bracket_matches_legacy():
+    for html in ('a<<br>b', 'a<b', '<x<video>y</video>z', '<<video>x</video>', '文字<br<br>', '<>'):
+        assert RSSWeiboParser.clean_html(html) == legacy_clean_html(html), html
+    assert RSSWeiboParser.clean_html('a<<br>b') == 'a<\nb'
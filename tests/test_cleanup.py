@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""推送标记并发写入测试"""
+
+import json
+import threading
+
+import cleanup
+
+
+def test_concurrent_marks_are_all_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cleanup, 'DATA_DIR', tmp_path)
+    monkeypatch.setattr(cleanup, 'CLEANUP_LOG_FILE', tmp_path / 'cleanup.json')
+    images = [tmp_path / f'page_{i}.png' for i in range(32)]
+    for image in images:
+        image.write_bytes(b'png')
+
+    threads = [threading.Thread(target=cleanup.mark_image_pushed, args=(str(image),)) for image in images]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    data = json.loads((tmp_path / 'cleanup.json').read_text(encoding='utf-8'))
+    assert set(data['pushed_images']) == {str(image.resolve()) for image in images}
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == '.tmp'] == []
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""配图缩小解码（JPEG draft）与全尺寸解码后缩放的一致性测试"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from create import WeiboImageGenerator
+from samples import sample_photo
+
+
+@pytest.fixture(scope='module')
+def generator():
+    return WeiboImageGenerator()
+
+
+@pytest.mark.parametrize('source', ((4000, 3000), (1080, 1920)))
+@pytest.mark.parametrize('side', (213, 640, 1920))
+def test_decode_image_matches_full_decode(generator, source, side):
+    content = sample_photo(source)
+    full = generator.crop_to_square(Image.open(BytesIO(content)).convert('RGB'), (side, side))
+    decoded = generator.decode_image(content, square_size=(side, side))
+    assert decoded.size == full.size
+    # 缩小解码在DCT域降采样，像素与全尺寸解码后缩放只有细微差别
+    assert max(ImageStat.Stat(ImageChops.difference(decoded, full)).mean) < 2
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""extract_media 单次扫描与旧实现的结果一致性测试"""
+
+import pytest
+
+from create import RSSWeiboParser
+from legacy import legacy_extract_media
+from samples import sample_description
+
+
+@pytest.mark.parametrize('paragraphs', (0, 1, 10, 40))
+@pytest.mark.parametrize('images', (0, 1, 4, 9))
+def test_extract_media_matches_legacy(paragraphs, images):
+    html = sample_description(paragraphs, images=images, seed=paragraphs)
+    assert RSSWeiboParser.extract_media(html) == legacy_extract_media(html)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""RSS条件请求验证器测试"""
+
+from feed_validators import FeedValidatorStore
+
+
+def test_commit_applies_staged_validators(tmp_path):
+    store = FeedValidatorStore(str(tmp_path))
+    store.stage('feed', {'ETag': '"v1"'})
+    assert store.request_headers('feed') == {}
+
+    store.commit('feed')
+    assert store.request_headers('feed') == {'If-None-Match': '"v1"'}
+
+
+def test_response_without_validators_clears_old_ones(tmp_path):
+    store = FeedValidatorStore(str(tmp_path))
+    store.stage('feed', {'ETag': '"v1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+    store.commit('feed')
+
+    store.stage('feed', {})
+    # 确认前仍使用旧的验证器，处理失败时不会丢失
+    assert store.request_headers('feed')
+    store.commit('feed')
+    assert store.request_headers('feed') == {}
+
+    store.save()
+    assert FeedValidatorStore(str(tmp_path)).request_headers('feed') == {}
+
+
+def test_commit_without_stage_keeps_validators(tmp_path):
+    store = FeedValidatorStore(str(tmp_path))
+    store.stage('feed', {'ETag': '"v1"'})
+    store.commit('feed')
+    store.commit('feed')
+    assert store.request_headers('feed') == {'If-None-Match': '"v1"'}
+
+
+def test_commit_keeps_channel_info_for_restart(tmp_path):
+    store = FeedValidatorStore(str(tmp_path))
+    store.stage('feed', {'ETag': '"v1"'})
+    store.commit('feed', {'title': '频道', 'link': 'https://weibo.com/u/1', 'image_url': 'https://tvax1.sinaimg.cn/a.jpg',
+                          'description': '不保存'})
+    store.save()
+
+    channel = FeedValidatorStore(str(tmp_path)).channel_info('feed')
+    assert channel == {'title': '频道', 'link': 'https://weibo.com/u/1', 'image_url': 'https://tvax1.sinaimg.cn/a.jpg'}
+    assert store.channel_info('other') is None
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+裁剪/缩放规划与旧实现的输出尺寸一致性测试
+"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageChops, ImageStat
+
+from create import WeiboImageGenerator
+from geometry import square_crop_plan, poster_plan, apply_plan
+from legacy import legacy_crop_to_square, legacy_poster
+from samples import sample_photo
+
+
+@pytest.fixture(scope='module')
+def generator():
+    return WeiboImageGenerator()
+
+# 只比较尺寸，与源图内容无关，用单通道空白图加快计算
+SOURCE_SIZES = [(w, h) for w in (120, 333, 640, 1080, 2000) for h in (90, 333, 641, 1920)
+                if max(w, h) / min(w, h) <= 6]
+
+
+@pytest.mark.parametrize('size', SOURCE_SIZES)
+@pytest.mark.parametrize('side', (213, 427, 640, 1920))
+def test_square_crop_plan_matches_legacy_size(size, side):
+    assert square_crop_plan(size, side)[1] == legacy_crop_to_square(Image.new('L', size), (side, side)).size
+
+
+@pytest.mark.parametrize('size', SOURCE_SIZES)
+@pytest.mark.parametrize('max_width', (704, 1408, 2112))
+def test_poster_plan_matches_legacy_size(size, max_width):
+    assert poster_plan(size, max_width)[1] == legacy_poster(Image.new('L', size), max_width).size
+
+
+@pytest.mark.parametrize('size', ((333, 641), (640, 640), (2000, 1500)))
+def test_apply_plan_output_size(size):
+    img = Image.new('L', size)
+    for plan in (square_crop_plan(size, 427), poster_plan(size, 704)):
+        assert apply_plan(img, plan).size == plan[1]
+
+
+def test_apply_plan_keeps_image_when_unchanged():
+    img = Image.new('L', (640, 640))
+    assert apply_plan(img, square_crop_plan(img.size, 640)) is img
+
+
+# 新实现省去了小图先放大1.5倍再裁剪的中间步骤，像素只允许有重采样带来的细微差异
+@pytest.mark.parametrize('size', ((400, 300), (300, 400), (2000, 1500), (1080, 1920)))
+@pytest.mark.parametrize('side', (213, 640, 1920))
+def test_crop_to_square_close_to_legacy_pixels(generator, size, side):
+    img = Image.open(BytesIO(sample_photo(size))).convert('RGB')
+    cropped = generator.crop_to_square(img, (side, side))
+    diff = ImageStat.Stat(ImageChops.difference(cropped, legacy_crop_to_square(img, (side, side))))
+    assert max(diff.mean) < 8
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""图片下载缓存索引的延迟保存测试"""
+
+import os
+
+from media_cache import MediaCache
+
+HEADERS = {'Cache-Control': 'max-age=3600'}
+
+
+def test_index_is_written_on_flush_only(tmp_path):
+    cache = MediaCache(str(tmp_path), 1024 * 1024)
+    cache.put('https://wx1.sinaimg.cn/large/a.jpg', b'a' * 100, HEADERS)
+    assert not os.path.exists(cache.index_file)
+
+    cache.flush()
+    reloaded = MediaCache(str(tmp_path), 1024 * 1024)
+    assert reloaded.get('https://wx2.sinaimg.cn/large/a.jpg') == (b'a' * 100, True)
+
+
+def test_access_times_survive_restart(tmp_path):
+    cache = MediaCache(str(tmp_path), 1024 * 1024)
+    for name in ('old', 'new'):
+        cache.put(f'https://example.com/{name}.jpg', name.encode() * 50, HEADERS)
+    cache.flush()
+    # 读取较早写入的图片后它成为最近使用的条目
+    cache.get('https://example.com/old.jpg')
+    cache.flush()
+
+    reloaded = MediaCache(str(tmp_path), 250)
+    reloaded.put('https://example.com/third.jpg', b't' * 60, HEADERS)
+    assert reloaded.get('https://example.com/old.jpg')[0] is not None
+    assert reloaded.get('https://example.com/new.jpg') == (None, False)
+
+
+def test_flush_merges_entries_from_other_processes(tmp_path):
+    first = MediaCache(str(tmp_path), 1024 * 1024)
+    second = MediaCache(str(tmp_path), 1024 * 1024)
+    first.put('https://example.com/a.jpg', b'a' * 10, HEADERS)
+    second.put('https://example.com/b.jpg', b'b' * 10, HEADERS)
+    first.flush()
+    second.flush()
+
+    reloaded = MediaCache(str(tmp_path), 1024 * 1024)
+    assert reloaded.get('https://example.com/a.jpg')[0] == b'a' * 10
+    assert reloaded.get('https://example.com/b.jpg')[0] == b'b' * 10
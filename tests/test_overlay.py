@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+播放按钮和圆形头像叠加与旧实现的像素一致性测试（3x档位），头像阴影随档位缩放
+"""
+
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from create import WeiboImageGenerator
+from legacy import legacy_play_icon, legacy_circle_avatar
+from samples import sample_photo
+
+
+@pytest.fixture(scope='module')
+def generator():
+    return WeiboImageGenerator()
+
+
+@pytest.mark.parametrize('size', ((1920, 1080), (1080, 1920), (641, 333), (333, 641), (427, 427), (99, 77)))
+def test_play_icon_matches_legacy_pixels(generator, size):
+    img = Image.open(BytesIO(sample_photo(size))).convert('RGB')
+    assert generator.add_video_play_icon(img).tobytes() == legacy_play_icon(img).tobytes()
+
+
+@pytest.mark.parametrize('side', (192, 193))
+def test_circle_avatar_matches_legacy_pixels(generator, side):
+    avatar = Image.open(BytesIO(sample_photo((side, side)))).convert('RGB')
+    assert generator.create_circle_avatar(avatar, (side, side)).tobytes() == \
+        legacy_circle_avatar(avatar, (side, side)).tobytes()
+
+
+@pytest.mark.parametrize('side, offset', ((64, 1), (128, 1), (192, 2), (384, 4)))
+def test_avatar_shadow_scales_with_profile(generator, side, offset):
+    avatar = Image.new('RGB', (side, side), 'gray')
+    assert generator.create_circle_avatar(avatar, (side, side)).size == (side + offset * 2, side + offset * 2)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""分页渲染测试：配图在绘制到所在页时才解码"""
+
+from io import BytesIO
+
+from PIL import Image
+
+import create
+
+
+def test_images_are_decoded_page_by_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(create, 'OUTPUT_DIR', str(tmp_path))
+    generator = create.WeiboImageGenerator(page_max_height=1500)
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 900), 'gray').save(buffer, 'JPEG')
+    generator.fetch_image_bytes = lambda url, headers: buffer.getvalue()
+
+    events = []
+    decode_image, save = generator.decode_image, generator.encoder.save
+    monkeypatch.setattr(generator, 'decode_image', lambda *a, **kw: events.append('decode') or decode_image(*a, **kw))
+    monkeypatch.setattr(generator.encoder, 'save', lambda *a, **kw: events.append('save') or save(*a, **kw))
+
+    item = {'content': '测试', 'author': 'a', 'pub_date': '', 'link': 'https://weibo.com/123/AbCdEfGhI',
+            'image_urls': [f'https://example.com/{i}.jpg' for i in range(9)], 'video_info': None}
+    paths = generator.generate_pages({'title': 't', 'link': 'https://weibo.com/u/123'}, item, filename='t.jpg')
+
+    # 每页只解码本页的配图行（每行3张），不会在绘制第一页前解码全部9张
+    assert len(paths) > 1
+    chunks = [chunk.count('decode') for chunk in ' '.join(events).split('save')[:-1]]
+    assert len(chunks) == len(paths) and events[-1] == 'save'
+    assert sum(chunks) == 9 and all(count % 3 == 0 for count in chunks) and max(chunks) < 9
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""新浪图床规格选择测试：规格只限制宽度，横图需要改用更大的规格"""
+
+from io import BytesIO
+
+import pytest
+import requests
+from PIL import Image
+
+from create import WeiboImageGenerator, SINAIMG_VARIANTS
+
+URL = 'https://wx1.sinaimg.cn/orj360/abc123.jpg'
+
+
+def fake_sinaimg(original_size, missing=()):
+    """模拟新浪图床：各规格把宽度压到上限，返回 (fetch_image_bytes替身, 请求过的规格列表)"""
+    caps = dict(SINAIMG_VARIANTS)
+    requested = []
+
+    def fetch(url, headers):
+        variant = url.split('/')[-2]
+        requested.append(variant)
+        if variant in missing:
+            raise requests.exceptions.HTTPError('404 Client Error: Not Found')
+        width, height = original_size
+        cap = caps[variant]
+        if cap and width > cap:
+            width, height = cap, round(height * cap / width)
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'gray').save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    return fetch, requested
+
+
+@pytest.fixture
+def generator():
+    return WeiboImageGenerator()
+
+
+def test_portrait_uses_smallest_variant(generator):
+    generator.fetch_image_bytes, requested = fake_sinaimg((1500, 3000))
+    img = generator.download_image(URL, square_size=(640, 640))
+    assert requested == ['mw690']
+    assert img.size == (640, 640)
+
+
+def test_landscape_skips_width_capped_variants(generator):
+    # mw690 为 690x345，短边不够 640；需要宽度 1280，跳过 mw1024 直接取 mw2000
+    generator.fetch_image_bytes, requested = fake_sinaimg((3000, 1500))
+    img = generator.download_image(URL, square_size=(640, 640))
+    assert requested == ['mw690', 'mw2000']
+    assert img.size == (640, 640)
+
+
+def test_landscape_single_image_falls_through_to_large(generator):
+    generator.fetch_image_bytes, requested = fake_sinaimg((3000, 1500))
+    generator.download_image(URL, square_size=(1920, 1920))
+    assert requested == ['mw2000', 'large']
+
+
+def test_small_original_is_not_refetched(generator):
+    # 原图本身就小于规格上限时，更大的规格也不会更清晰
+    generator.fetch_image_bytes, requested = fake_sinaimg((600, 300))
+    generator.download_image(URL, square_size=(640, 640))
+    assert requested == ['mw690']
+
+
+def test_falls_back_to_capped_variant_when_larger_missing(generator):
+    generator.fetch_image_bytes, requested = fake_sinaimg((3000, 1500), missing=('mw2000', 'large'))
+    img = generator.download_image(URL, square_size=(640, 640))
+    assert requested == ['mw690', 'mw2000', 'large', 'orj360']
+    assert img.size == (640, 640)
+    assert not img.info.get('placeholder')
+
+
+def test_missing_variants_fall_back_to_original_url(generator):
+    generator.fetch_image_bytes, requested = fake_sinaimg((3000, 1500), missing=('mw690', 'mw1024', 'mw2000', 'large'))
+    img = generator.download_image(URL, square_size=(640, 640))
+    assert requested == ['mw690', 'mw1024', 'mw2000', 'large', 'orj360']
+    assert img.size == (640, 640)
+
+
+def test_landscape_host_starts_from_wide_enough_variant(generator):
+    # 该主机最近的配图多为 2:1 横图，之后直接请求足够宽的规格，不再先下载一次 mw690
+    generator.fetch_image_bytes, requested = fake_sinaimg((3000, 1500))
+    for _ in range(3):
+        generator.download_image(URL, square_size=(640, 640))
+    requested.clear()
+    img = generator.download_image(URL, square_size=(640, 640))
+    assert requested == ['mw2000']
+    assert img.size == (640, 640)
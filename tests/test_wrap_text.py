@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""wrap_text 字宽累加断行与旧实现（逐字符 textbbox 测量）的一致性测试"""
+
+import pytest
+
+from create import WeiboImageGenerator
+from legacy import legacy_wrap_text
+from samples import sample_text
+
+
+@pytest.fixture(scope='module')
+def generator():
+    return WeiboImageGenerator()
+
+
+@pytest.mark.parametrize('text', [
+    *(sample_text(chars, seed=seed) for chars in (50, 500, 3000) for seed in range(2)),
+    'A' * 500,
+    '测' * 500,
+    '',
+])
+def test_wrap_text_matches_legacy(generator, text):
+    font = generator.content_font
+    max_width = 2400 - 64 * 2 - 80 * 2
+    assert generator.wrap_text(text, font, max_width) == legacy_wrap_text(generator, text, font, max_width)